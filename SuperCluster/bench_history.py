@@ -0,0 +1,260 @@
+# bench_history.py
+"""Append-only benchmark history and a throughput regression detector.
+
+Every benchmark run appends one NDJSON line to a history file
+(benchmark_history.ndjson by default):
+
+    {"benchmark": "pi", "timestamp": ..., "git_sha": ..., "git_dirty": false,
+     "nodes": 4, "hostfile_sha256": ..., "mpi_settings": {"OMPI_MCA_btl": ...},
+     "config": "<hash of nodes, hostfile and MPI settings>",
+     "measurements": [{"case": "points=10000000", "metric": "points_per_second",
+                       "values": [...], "higher_is_better": true}, ...]}
+
+Runs of one benchmark at one node count form a timeline per (case,
+metric). Consecutive runs with the same git SHA and config are one
+group; the detector compares the newest group against a baseline of
+the latest --baseline-runs earlier runs with the previous group's
+config (so one run per commit still builds up a sample) using Welch's
+t-test (one sample against the baseline's prediction interval), and
+flags a regression when the metric got worse by at least --min-change
+with one-sided p below --alpha. A baseline of a single sample has no
+spread to test against; then the change alone decides. Each finding
+names what differs between the groups (commit, hostfile, MCA
+settings), so a tuning change that costs throughput never goes
+unnoticed.
+
+Usage:
+    python bench_history.py add benchmark_4nodes.json --benchmark pi --nodes 4
+    python bench_history.py list
+    python bench_history.py check [--alpha 0.01] [--min-change 0.05]   # exit 1 on regression
+
+benchmark_pi.py and the other cluster benchmarks append their runs
+themselves (--history).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from bench_stats import welch_t_test
+
+DEFAULT_HISTORY = "benchmark_history.ndjson"
+
+# OMPI_MCA_* variables mpirun sets for its own bookkeeping (job ids,
+# daemon URIs, session dirs), as opposed to tuning settings.
+LAUNCHER_MCA = ("OMPI_MCA_orte_", "OMPI_MCA_ess", "OMPI_MCA_pmix", "OMPI_MCA_initial_wdir",
+                "OMPI_MCA_shmem_RUNTIME_QUERY_hint")
+
+
+def mca_settings() -> dict[str, str]:
+    """OMPI_MCA_* tuning variables in this process's environment."""
+    return {k: v for k, v in sorted(os.environ.items())
+            if k.startswith("OMPI_MCA_") and not k.startswith(LAUNCHER_MCA)}
+
+
+def git_revision(path: str | None = None) -> tuple[str | None, bool]:
+    """(HEAD SHA, tracked files modified) of the checkout holding path; (None, False) outside git."""
+    cwd = path or os.path.dirname(os.path.abspath(__file__))
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return sha, bool(dirty)
+
+
+def file_sha256(path: str | None) -> str | None:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def measurement(case: str, metric: str, values, higher_is_better: bool = True) -> dict:
+    """One metric of one benchmark case; values is a number or a list of samples."""
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    return {"case": case, "metric": metric, "values": [float(v) for v in values],
+            "higher_is_better": higher_is_better}
+
+
+def record_run(path: str, benchmark: str, measurements: list[dict], nodes: int,
+               hostfile: str | None = "hostfile", extra: dict | None = None) -> dict:
+    """Append one run to the history file at path and return the entry."""
+    sha, dirty = git_revision()
+    settings = mca_settings()
+    hostfile_sha = file_sha256(hostfile)
+    config = hashlib.sha256(json.dumps([nodes, hostfile_sha, settings], sort_keys=True)
+                            .encode()).hexdigest()[:12]
+    entry = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_sha": sha,
+        "git_dirty": dirty,
+        "nodes": nodes,
+        "hostfile_sha256": hostfile_sha,
+        "mpi_settings": settings,
+        "config": config,
+        "measurements": measurements,
+    }
+    if extra:
+        entry.update(extra)
+    # One write of one line in append mode: concurrent runs never interleave.
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+
+def load_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def pi_measurements(results: list[dict]) -> list[dict]:
+    """benchmark_pi.py results -> points_per_second per point count, every repeat if recorded."""
+    return [measurement(f"points={r['points']}", "points_per_second",
+                        r.get("points_per_second_samples") or r["points_per_second"])
+            for r in results]
+
+
+def _differences(old: dict, new: dict) -> list[str]:
+    changed = []
+    if old["git_sha"] != new["git_sha"]:
+        changed.append(f"git {str(old['git_sha'])[:10]} -> {str(new['git_sha'])[:10]}")
+    if old.get("hostfile_sha256") != new.get("hostfile_sha256"):
+        changed.append("hostfile")
+    before, after = old.get("mpi_settings", {}), new.get("mpi_settings", {})
+    for key in sorted(set(before) | set(after)):
+        if before.get(key) != after.get(key):
+            changed.append(f"{key}: {before.get(key)} -> {after.get(key)}")
+    return changed
+
+
+def _groups(runs: list[dict]) -> list[list[dict]]:
+    groups = []
+    for run in runs:
+        if groups and (groups[-1][-1]["git_sha"], groups[-1][-1]["config"]) == (run["git_sha"], run["config"]):
+            groups[-1].append(run)
+        else:
+            groups.append([run])
+    return groups
+
+
+def detect_regressions(history: list[dict], alpha: float = 0.01,
+                       min_change: float = 0.05, baseline_runs: int = 5) -> list[dict]:
+    """Compare the newest group of runs with the runs before, per benchmark, node count, case and metric.
+
+    The baseline is the latest baseline_runs runs before the newest
+    group that share the previous group's config. Returns one finding
+    per comparable series; 'regression' is True for a change for the
+    worse of at least min_change that is significant, or, with a single
+    baseline sample ('test': 'threshold'), for that change alone.
+    """
+    timelines = {}
+    for run in history:
+        for m in run["measurements"]:
+            key = (run["benchmark"], run["nodes"], m["case"], m["metric"])
+            timelines.setdefault(key, []).append((run, m))
+
+    findings = []
+    for (benchmark, nodes, case, metric), series in timelines.items():
+        groups = _groups([run for run, _ in series])
+        if len(groups) < 2:
+            continue
+        samples = {id(run): m for run, m in series}
+        old, new = groups[-2], groups[-1]
+        pooled = [run for group in groups[:-1] for run in group
+                  if run["config"] == old[-1]["config"]][-baseline_runs:]
+        baseline = [v for run in pooled for v in samples[id(run)]["values"]]
+        candidate = [v for run in new for v in samples[id(run)]["values"]]
+        higher = samples[id(new[-1])]["higher_is_better"]
+        base_mean = sum(baseline) / len(baseline)
+        cand_mean = sum(candidate) / len(candidate)
+        change = (cand_mean - base_mean) / base_mean if base_mean else 0.0
+        p_value = None
+        if len(baseline) >= 2:
+            # welch_t_test asks "did it drop?"; flip the sign for lower-is-better metrics.
+            sign = 1 if higher else -1
+            _, _, p_value = welch_t_test([sign * v for v in baseline],
+                                         [sign * v for v in candidate])
+        worse = -change if higher else change
+        findings.append({
+            "benchmark": benchmark,
+            "nodes": nodes,
+            "case": case,
+            "metric": metric,
+            "baseline": {"git_sha": old[-1]["git_sha"], "config": old[-1]["config"],
+                         "runs": len(pooled), "samples": len(baseline), "mean": base_mean},
+            "candidate": {"git_sha": new[-1]["git_sha"], "config": new[-1]["config"],
+                          "runs": len(new), "samples": len(candidate), "mean": cand_mean},
+            "change": change,
+            "p_value": p_value,
+            "test": "welch" if p_value is not None else "threshold",
+            "changed": _differences(old[-1], new[-1]),
+            "regression": worse >= min_change and (p_value is None or p_value < alpha),
+        })
+    return findings
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark history and regression detection")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="NDJSON history file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="append an existing benchmark_pi.py results JSON")
+    add.add_argument("results")
+    add.add_argument("--benchmark", default="pi")
+    add.add_argument("--nodes", type=int, default=None,
+                     help="node count (default: taken from the results)")
+    add.add_argument("--hostfile", default="hostfile")
+    sub.add_parser("list", help="one line per stored run, oldest first")
+    check = sub.add_parser("check", help="compare the newest runs with the ones before them")
+    check.add_argument("--alpha", type=float, default=0.01,
+                       help="one-sided significance level")
+    check.add_argument("--min-change", type=float, default=0.05,
+                       help="smallest relative change for the worse that counts")
+    check.add_argument("--baseline-runs", type=int, default=5,
+                       help="earlier runs of the previous config pooled into the baseline")
+    check.add_argument("--all", action="store_true", help="also print series that did not regress")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        with open(args.results) as f:
+            results = json.load(f)
+        nodes = args.nodes or (results[0]["nodes"] if results else 1)
+        entry = record_run(args.history, args.benchmark, pi_measurements(results), nodes,
+                           args.hostfile)
+        print(f"Recorded {args.benchmark} on {nodes} nodes at {entry['git_sha']} "
+              f"(config {entry['config']})")
+    elif args.command == "list":
+        for run in load_history(args.history):
+            print(f"{run['timestamp']}  {run['benchmark']:<16} {run['nodes']:>4} nodes  "
+                  f"{str(run['git_sha'])[:10]}{'+' if run['git_dirty'] else ''}  "
+                  f"config {run['config']}  {len(run['measurements'])} measurements")
+    else:
+        findings = detect_regressions(load_history(args.history), args.alpha, args.min_change,
+                                      args.baseline_runs)
+        regressions = [f for f in findings if f["regression"]]
+        for f in findings if args.all else regressions:
+            p = "n/a, threshold only" if f["p_value"] is None else f"{f['p_value']:.4f}"
+            print(f"{'REGRESSION' if f['regression'] else 'ok':<10} {f['benchmark']} "
+                  f"{f['nodes']} nodes {f['case']} {f['metric']}: "
+                  f"{f['baseline']['mean']:.4g} -> {f['candidate']['mean']:.4g} "
+                  f"({f['change']:+.1%}, p={p})")
+            for change in f["changed"]:
+                print(f"           changed: {change}")
+        print(f"{len(regressions)} regression(s) in {len(findings)} compared series")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
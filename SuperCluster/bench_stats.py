@@ -0,0 +1,133 @@
+# bench_stats.py
+"""Small statistics helpers for the SuperCluster benchmarks.
+
+Only the standard library (plus NumPy for resampling): the cluster
+images do not ship SciPy. Student's t distribution is evaluated through
+the regularized incomplete beta function, with the continued fraction
+from Numerical Recipes (Lentz's method).
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-14:
+            break
+    return h
+
+
+def betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x))
+    # The continued fraction converges fast only below this point.
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def t_cdf(t: float, df: float) -> float:
+    """P(T <= t) for Student's t with df degrees of freedom."""
+    if math.isinf(t):
+        return 1.0 if t > 0 else 0.0
+    tail = 0.5 * betainc(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+
+def t_ppf(q: float, df: float) -> float:
+    """Inverse of t_cdf, by bisection."""
+    if not 0.0 < q < 1.0:
+        raise ValueError("quantile must be in (0, 1)")
+    lo, hi = -1e8, 1e8
+    for _ in range(200):
+        mid = (lo + hi) / 2.0
+        if t_cdf(mid, df) < q:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo < 1e-12 * max(1.0, abs(mid)):
+            break
+    return (lo + hi) / 2.0
+
+
+def mean_ci(samples, confidence: float = 0.95) -> tuple[float, float, float]:
+    """(mean, low, high): Student-t confidence interval for the mean."""
+    values = np.asarray(samples, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, mean, mean
+    half = t_ppf(0.5 + confidence / 2.0, len(values) - 1) * values.std(ddof=1) / math.sqrt(len(values))
+    return mean, mean - half, mean + half
+
+
+def bootstrap_ci(statistic, groups, confidence: float = 0.95, resamples: int = 2000,
+                 seed: int = 0) -> tuple[float, float]:
+    """Percentile bootstrap CI of statistic(*means) over independent sample groups.
+
+    Each group is resampled with replacement and reduced to its mean;
+    statistic combines the per-group means (e.g. a speedup T1 / Tp).
+    """
+    rng = np.random.default_rng(seed)
+    means = []
+    for group in groups:
+        values = np.asarray(group, dtype=float)
+        picks = rng.integers(0, len(values), size=(resamples, len(values)))
+        means.append(values[picks].mean(axis=1))
+    stats = statistic(*means)
+    tail = (1.0 - confidence) / 2.0
+    low, high = np.quantile(stats, [tail, 1.0 - tail])
+    return float(low), float(high)
+
+
+def welch_t_test(baseline, candidate) -> tuple[float, float, float]:
+    """(t, df, p): Welch's test that candidate's mean is below baseline's.
+
+    p is the one-sided probability of a t this low if the means were
+    equal. A single candidate sample is tested against the baseline's
+    prediction interval instead (t with n - 1 degrees of freedom).
+    """
+    a = np.asarray(baseline, dtype=float)
+    b = np.asarray(candidate, dtype=float)
+    if len(a) < 2:
+        raise ValueError("baseline needs at least two samples")
+    va = a.var(ddof=1) / len(a)
+    if len(b) < 2:
+        se = math.sqrt(a.var(ddof=1) * (1 + 1 / len(a)))
+        df = len(a) - 1
+    else:
+        vb = b.var(ddof=1) / len(b)
+        se = math.sqrt(va + vb)
+        df = float((va + vb) ** 2 / (va ** 2 / (len(a) - 1) + vb ** 2 / (len(b) - 1))) if se else 1.0
+    diff = float(b.mean() - a.mean())
+    if se == 0:
+        t = math.copysign(math.inf, diff) if diff else 0.0
+    else:
+        t = diff / se
+    return t, df, t_cdf(t, df)
@@ -0,0 +1,167 @@
+# benchmark_connect_scan.py
+"""Benchmark the asyncio connect engine against the nmap path.
+
+Starts a local stand-in fixture -- TCP listeners on a handful of
+loopback addresses -- and scans it with both engines, so the numbers
+reflect engine overhead rather than a real network. Each stand-in host
+has `--open` listening ports followed by `--closed` ports nobody
+listens on.
+
+Run locally (no MPI needed):
+    python benchmark_connect_scan.py --hosts 16 --open 8 --closed 24
+
+Loopback addresses beyond 127.0.0.1 work out of the box on Linux; on
+macOS alias them first (`sudo ifconfig lo0 alias 127.0.0.2`) or use
+--hosts 1. The nmap leg is skipped when python-nmap or the nmap binary
+is missing.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from connect_scan import ConnectScanner
+
+
+def _free_port_block(count: int) -> int:
+    """Find `count` consecutive ports that are free on 127.0.0.1."""
+    for _ in range(50):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        if base + count >= 65536:
+            continue
+        socks = []
+        try:
+            for port in range(base, base + count):
+                s = socket.socket()
+                socks.append(s)
+                s.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+        finally:
+            for s in socks:
+                s.close()
+    raise RuntimeError(f"no block of {count} free ports found")
+
+
+class ListenerFixture:
+    """Loopback TCP listeners served from a background event loop."""
+
+    def __init__(self, hosts: int, open_ports: int, closed_ports: int):
+        self.hosts = [f"127.0.0.{i + 1}" for i in range(hosts)]
+        base = _free_port_block(open_ports + closed_ports)
+        self.open_ports = list(range(base, base + open_ports))
+        self.closed_ports = list(range(base + open_ports, base + open_ports + closed_ports))
+        self._loop = asyncio.new_event_loop()
+        self._servers: list[asyncio.AbstractServer] = []
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @staticmethod
+    async def _handle(reader, writer):
+        writer.close()
+
+    async def _start(self):
+        for host in self.hosts:
+            for port in self.open_ports:
+                self._servers.append(await asyncio.start_server(self._handle, host, port))
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        async def _stop():
+            for server in self._servers:
+                server.close()
+                await server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(_stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    @property
+    def ports(self) -> list[int]:
+        return self.open_ports + self.closed_ports
+
+
+def _count_open(records) -> int:
+    return sum(len(r["ports"]) for r in records)
+
+
+def bench_connect(fixture: ListenerFixture, concurrency: int, timeout: float) -> dict:
+    scanner = ConnectScanner(fixture.ports, concurrency=concurrency, timeout=timeout)
+    start = time.perf_counter()
+    records = scanner.scan(fixture.hosts)
+    elapsed = time.perf_counter() - start
+    return {"engine": "connect", "seconds": elapsed, "open_ports_found": _count_open(records)}
+
+
+def _nmap_scanner():
+    try:
+        import nmap  # noqa: PLC0415
+
+        return nmap.PortScanner()
+    except Exception as e:  # noqa: BLE001  (python-nmap or nmap binary missing)
+        print(f"Skipping nmap leg: {e}")
+        return None
+
+
+def bench_nmap(nm, fixture: ListenerFixture) -> dict | None:
+    if nm is None:
+        return None
+    ports = ",".join(map(str, fixture.ports))
+    start = time.perf_counter()
+    data = nm.scan(hosts=" ".join(fixture.hosts), arguments=f"-sT -Pn -n -T4 -p {ports}")
+    elapsed = time.perf_counter() - start
+    found = sum(
+        1
+        for host in data["scan"].values()
+        for port in host.get("tcp", {}).values()
+        if port["state"] == "open"
+    )
+    return {"engine": "nmap", "seconds": elapsed, "open_ports_found": found}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=8, help="loopback stand-in hosts")
+    parser.add_argument("--open", type=int, default=8, help="listening ports per host")
+    parser.add_argument("--closed", type=int, default=24, help="closed ports per host")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_connect_scan.json")
+    args = parser.parse_args()
+
+    results = []
+    nm = _nmap_scanner()
+    with ListenerFixture(args.hosts, args.open, args.closed) as fixture:
+        expected = len(fixture.hosts) * len(fixture.open_ports)
+        probes = len(fixture.hosts) * len(fixture.ports)
+        for trial in range(args.repeat):
+            for run in (bench_connect(fixture, args.concurrency, args.timeout), bench_nmap(nm, fixture)):
+                if run is None:
+                    continue
+                run.update(trial=trial, hosts=len(fixture.hosts), probes=probes,
+                           expected_open=expected,
+                           probes_per_second=probes / run["seconds"] if run["seconds"] > 0 else 0)
+                results.append(run)
+                print(f"{run['engine']:>7}: {run['seconds']:.4f}s, "
+                      f"{run['probes_per_second']:.0f} probes/s, "
+                      f"{run['open_ports_found']}/{expected} open ports found")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,237 @@
+# benchmark_mpi_comm.py
+"""MPI communication micro-benchmarks: point-to-point and collectives.
+
+benchmark_pi.py barely communicates, so it cannot show whether the
+transport settings in optimized_mpi_settings.sh (btl, eager limit,
+leave_pinned, coll components) help. This module times the operations
+those settings affect, across message sizes, with mpi4py's buffer
+(uppercase) calls so no pickling is measured:
+
+- pingpong: rank 0 <-> `--peer` (default the last rank, ideally on
+  another node); latency is half the round trip, bandwidth is bytes
+  over that half
+- stream: rank 0 posts a window of Isend to the peer, which Irecvs
+  them and acknowledges (sustained one-way bandwidth)
+- bcast, scatter, gather, allreduce over every rank (size is bytes per
+  rank; allreduce sums float64), timed as the slowest rank's average
+
+Results, with the OMPI_MCA_* environment and MPI library version, go
+to JSON; `--compare` prints the ratio against an earlier run, e.g.
+
+    mpirun --hostfile hostfile -np 4 python benchmark_mpi_comm.py -o default.json
+    source optimized_mpi_settings.sh
+    mpirun --hostfile hostfile -np 4 python benchmark_mpi_comm.py -o tuned.json --compare default.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+import numpy as np
+from mpi4py import MPI
+
+from bench_history import DEFAULT_HISTORY, measurement, mca_settings, record_run
+
+TESTS = ("pingpong", "stream", "bcast", "scatter", "gather", "allreduce")
+
+# Outstanding sends per stream window, as in osu_bw.
+WINDOW = 64
+
+
+def message_sizes(max_size: int) -> list[int]:
+    """1 byte, then powers of two up to max_size."""
+    sizes, size = [], 1
+    while size <= max_size:
+        sizes.append(size)
+        size *= 2
+    return sizes
+
+
+def iterations(size: int, budget: int, low: int = 10, high: int = 1000) -> int:
+    """Repetitions for one size: about `budget` bytes moved, within [low, high]."""
+    return max(low, min(high, budget // max(size, 1)))
+
+
+def pingpong(comm, peer: int, size: int, iters: int, warmup: int) -> float | None:
+    """Seconds per one-way message between rank 0 and peer (rank 0 only)."""
+    rank = comm.Get_rank()
+    buf = np.zeros(size, dtype=np.uint8)
+    elapsed = None
+    if rank in (0, peer):
+        other = peer if rank == 0 else 0
+        for i in range(warmup + iters):
+            if i == warmup:
+                started = MPI.Wtime()
+            if rank == 0:
+                comm.Send(buf, dest=other, tag=1)
+                comm.Recv(buf, source=other, tag=1)
+            else:
+                comm.Recv(buf, source=other, tag=1)
+                comm.Send(buf, dest=other, tag=1)
+        elapsed = (MPI.Wtime() - started) / iters / 2
+    comm.Barrier()
+    return elapsed if rank == 0 else None
+
+
+def stream(comm, peer: int, size: int, iters: int, warmup: int) -> float | None:
+    """Seconds per message in windows of WINDOW back-to-back sends (rank 0 only)."""
+    rank = comm.Get_rank()
+    window = max(1, min(WINDOW, iters))
+    rounds = max(1, iters // window)
+    bufs = [np.zeros(size, dtype=np.uint8) for _ in range(window)]
+    ack = np.zeros(1, dtype=np.uint8)
+    elapsed = None
+    if rank in (0, peer):
+        for r in range(warmup + rounds):
+            if r == warmup:
+                started = MPI.Wtime()
+            if rank == 0:
+                MPI.Request.Waitall([comm.Isend(b, dest=peer, tag=2) for b in bufs])
+                comm.Recv(ack, source=peer, tag=3)
+            else:
+                MPI.Request.Waitall([comm.Irecv(b, source=0, tag=2) for b in bufs])
+                comm.Send(ack, dest=0, tag=3)
+        elapsed = (MPI.Wtime() - started) / (rounds * window)
+    comm.Barrier()
+    return elapsed if rank == 0 else None
+
+
+def _collective(comm, op, iters: int, warmup: int) -> float | None:
+    for _ in range(warmup):
+        op()
+    comm.Barrier()
+    started = MPI.Wtime()
+    for _ in range(iters):
+        op()
+    local = (MPI.Wtime() - started) / iters
+    slowest = comm.reduce(local, op=MPI.MAX, root=0)
+    return slowest if comm.Get_rank() == 0 else None
+
+
+def collective(comm, name: str, size: int, iters: int, warmup: int) -> float | None:
+    """Seconds per call of the named collective with `size` bytes per rank (rank 0 only)."""
+    nprocs = comm.Get_size()
+    if name == "bcast":
+        buf = np.zeros(size, dtype=np.uint8)
+        op = lambda: comm.Bcast(buf, root=0)
+    elif name == "scatter":
+        send = np.zeros(size * nprocs, dtype=np.uint8) if comm.Get_rank() == 0 else None
+        recv = np.zeros(size, dtype=np.uint8)
+        op = lambda: comm.Scatter(send, recv, root=0)
+    elif name == "gather":
+        send = np.zeros(size, dtype=np.uint8)
+        recv = np.zeros(size * nprocs, dtype=np.uint8) if comm.Get_rank() == 0 else None
+        op = lambda: comm.Gather(send, recv, root=0)
+    elif name == "allreduce":
+        send = np.ones(max(1, size // 8), dtype=np.float64)
+        recv = np.empty_like(send)
+        op = lambda: comm.Allreduce(send, recv, op=MPI.SUM)
+    else:
+        raise ValueError(f"unknown collective {name!r}")
+    return _collective(comm, op, iters, warmup)
+
+
+def run(comm, tests, sizes: list[int], peer: int, budget: int, warmup: int) -> list[dict]:
+    """Collective: every requested test at every size; result rows on rank 0."""
+    rows = []
+    for test in tests:
+        for size in sizes:
+            iters = iterations(size, budget)
+            if test == "pingpong":
+                seconds = pingpong(comm, peer, size, iters, warmup)
+            elif test == "stream":
+                seconds = stream(comm, peer, size, iters, warmup)
+            else:
+                seconds = collective(comm, test, size, iters, warmup)
+            if comm.Get_rank() == 0:
+                row = {
+                    "test": test,
+                    "bytes": size,
+                    "iterations": iters,
+                    "latency_us": seconds * 1e6,
+                    "bandwidth_mb_s": size / seconds / 1e6 if seconds > 0 else None,
+                }
+                rows.append(row)
+                bandwidth = row["bandwidth_mb_s"] or 0.0
+                print(f"{test:>10} {size:>10} B  {row['latency_us']:>12.2f} us  "
+                      f"{bandwidth:>10.1f} MB/s")
+    return rows
+
+
+def environment(comm) -> dict:
+    """What the numbers depend on: MCA settings, MPI library and placement."""
+    return {
+        "ranks": comm.Get_size(),
+        "processors": comm.gather(MPI.Get_processor_name(), root=0),
+        "mpi_library": MPI.Get_library_version().strip("\x00 \n"),
+        "mca": mca_settings(),
+    }
+
+
+def compare(rows: list[dict], baseline: list[dict]) -> None:
+    """Print baseline / current latency per test and size (above 1 means faster now)."""
+    before = {(r["test"], r["bytes"]): r["latency_us"] for r in baseline}
+    print(f"{'test':>10} {'bytes':>10}  {'speedup':>8}")
+    for row in rows:
+        old = before.get((row["test"], row["bytes"]))
+        if old and row["latency_us"] > 0:
+            print(f"{row['test']:>10} {row['bytes']:>10}  {old / row['latency_us']:>7.2f}x")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="MPI point-to-point and collective micro-benchmarks")
+    parser.add_argument("--tests", default=",".join(TESTS),
+                        help=f"comma-separated subset of {', '.join(TESTS)}")
+    parser.add_argument("--max-size", type=int, default=4 << 20,
+                        help="largest message in bytes (per rank for collectives)")
+    parser.add_argument("--peer", type=int, default=None,
+                        help="rank paired with rank 0 for pingpong/stream (default: last rank)")
+    parser.add_argument("--budget", type=int, default=64 << 20,
+                        help="approximate bytes moved per test and size; sets iteration counts")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed iterations first")
+    parser.add_argument("--label", default=None, help="free-form name stored with the results")
+    parser.add_argument("-o", "--output", default=None,
+                        help="JSON results (default mpi_comm_<N>ranks.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to compare against")
+    parser.add_argument("--history", default=DEFAULT_HISTORY,
+                        help="append this run to the benchmark history (empty to skip)")
+    parser.add_argument("--hostfile", default="hostfile",
+                        help="hostfile the job was started with, hashed into the history entry")
+    args = parser.parse_args(argv)
+
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    tests = [t for t in args.tests.split(",") if t]
+    unknown = set(tests) - set(TESTS)
+    if unknown:
+        parser.error(f"unknown tests: {', '.join(sorted(unknown))}")
+    peer = size - 1 if args.peer is None else args.peer
+    if size < 2:
+        tests = [t for t in tests if t not in ("pingpong", "stream")]
+    elif not 0 < peer < size:
+        parser.error(f"--peer must be between 1 and {size - 1}")
+
+    env = environment(comm)
+    if rank == 0:
+        print(f"=== MPI communication benchmark with {size} ranks ===")
+    rows = run(comm, tests, message_sizes(args.max_size), peer, args.budget, args.warmup)
+
+    if rank == 0:
+        output = args.output or f"mpi_comm_{size}ranks.json"
+        with open(output, "w") as f:
+            json.dump({"label": args.label, "environment": env, "peer": peer,
+                       "results": rows}, f, indent=2)
+        print(f"Results written to {output}")
+        if args.history:
+            record_run(args.history, "mpi_comm",
+                       [measurement(f"{r['test']} bytes={r['bytes']}", "latency_us",
+                                    r["latency_us"], higher_is_better=False) for r in rows],
+                       size, args.hostfile)
+        if args.compare:
+            with open(args.compare) as f:
+                compare(rows, json.load(f)["results"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,24 +1,59 @@
 # benchmark_pi.py
 from mpi4py import MPI
-import time
+import argparse
 import numpy as np
 
 class PiBenchmark:
-    def __init__(self):
-        self.comm = MPI.COMM_WORLD
+    def __init__(self, block_size=2**20, seed=None, comm=None):
+        self.comm = comm if comm is not None else MPI.COMM_WORLD
         self.rank = self.comm.Get_rank()
         self.size = self.comm.Get_size()
-        
-    def calculate_pi_monte_carlo(self, n_points):
+        # One root seed for the whole job; every rank derives its own
+        # independent stream from it. Without one, rank 0 draws fresh
+        # OS entropy and shares it so the run can be repeated later.
+        if seed is None:
+            seed = np.random.SeedSequence().entropy if self.rank == 0 else None
+            seed = self.comm.bcast(seed, root=0)
+        self.seed = seed
+        # Points drawn per NumPy call. Bounds memory (two float64 per
+        # point) while keeping each call long enough that interpreter
+        # overhead vanishes next to the arithmetic.
+        self.block_size = block_size
+
+    def local_points(self, n_points):
+        """This rank's share of n_points; the remainder goes to the lowest ranks"""
+        base, extra = divmod(n_points, self.size)
+        return base + (self.rank < extra)
+
+    def count_hits(self, n, rng):
+        """How many of n uniform points in the unit square fall inside the quarter circle"""
+        hits = 0
+        buf = np.empty(2 * min(n, self.block_size))
+        while n:
+            m = min(n, self.block_size)
+            xy = rng.random(out=buf[:2 * m])
+            x, y = xy[:m], xy[m:]
+            np.multiply(x, x, out=x)
+            np.multiply(y, y, out=y)
+            x += y
+            hits += int(np.count_nonzero(x <= 1.0))
+            n -= m
+        return hits
+
+    def rank_rng(self, run=0):
+        """Generator for this rank's stream in benchmark run `run`
+
+        Same as SeedSequence(seed).spawn(...)[run].spawn(...)[rank]: the
+        spawn key gives every (run, rank) pair a statistically
+        independent stream, unlike seeding with rank + time.
+        """
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(run, self.rank)))
+
+    def calculate_pi_monte_carlo(self, n_points, run=0):
         """Monte Carlo method for Pi calculation"""
-        local_count = 0
-        np.random.seed(self.rank + int(time.time()))
-        
-        for _ in range(n_points // self.size):
-            x, y = np.random.random(2)
-            if x**2 + y**2 <= 1:
-                local_count += 1
-                
+        rng = self.rank_rng(run)
+        local_count = self.count_hits(self.local_points(n_points), rng)
+
         total_count = self.comm.reduce(local_count, op=MPI.SUM, root=0)
         
         if self.rank == 0:
@@ -26,17 +61,20 @@ class PiBenchmark:
             return pi_estimate
         return None
     
-    def benchmark(self, max_points=10**7):
-        """Run scalability benchmarks"""
+    def benchmark(self, max_points=10**7, repeats=1):
+        """Run scalability benchmarks, each point count `repeats` times"""
         points_list = [10**i for i in range(3, int(np.log10(max_points)) + 1)]
         
         if self.rank == 0:
             results = []
             
-        for n_points in points_list:
-            start_time = MPI.Wtime()
-            pi = self.calculate_pi_monte_carlo(n_points)
-            elapsed = MPI.Wtime() - start_time
+        for index, n_points in enumerate(points_list):
+            timings = []
+            for repeat in range(repeats):
+                start_time = MPI.Wtime()
+                pi = self.calculate_pi_monte_carlo(n_points, index * repeats + repeat)
+                timings.append(MPI.Wtime() - start_time)
+            elapsed = float(np.median(timings))
             
             if self.rank == 0:
                 results.append({
@@ -44,7 +82,9 @@ class PiBenchmark:
                     'pi_estimate': pi,
                     'time_seconds': elapsed,
                     'nodes': self.size,
-                    'points_per_second': n_points / elapsed if elapsed > 0 else 0
+                    'seed': self.seed,
+                    'points_per_second': n_points / elapsed if elapsed > 0 else 0,
+                    'points_per_second_samples': [n_points / t if t > 0 else 0 for t in timings]
                 })
                 print(f"Nodes: {self.size}, Points: {n_points}, Time: {elapsed:.4f}s, Pi: {pi:.10f}")
         
@@ -53,14 +93,34 @@ class PiBenchmark:
 
 # Run benchmark
 if __name__ == "__main__":
-    benchmark = PiBenchmark()
-    
+    parser = argparse.ArgumentParser(description='MPI Monte Carlo Pi benchmark')
+    parser.add_argument('--max-points', type=float, default=1e7,
+                        help='largest total point count; runs 10^3 .. this in powers of ten')
+    parser.add_argument('--block-size', type=int, default=2**20,
+                        help='points drawn per NumPy call (memory ~16 bytes per point)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='root seed; the same seed and node count reproduce every estimate')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='timed runs per point count; the history keeps every sample '
+                             'so bench_history.py check can test the spread')
+    parser.add_argument('--history', default='benchmark_history.ndjson',
+                        help='append this run to the benchmark history (empty to skip); '
+                             'see bench_history.py check')
+    parser.add_argument('--hostfile', default='hostfile',
+                        help='hostfile the job was started with, hashed into the history entry')
+    args = parser.parse_args()
+    benchmark = PiBenchmark(block_size=args.block_size, seed=args.seed)
+
     if MPI.COMM_WORLD.Get_rank() == 0:
-        print(f"=== MPI Pi Benchmark with {MPI.COMM_WORLD.Get_size()} nodes ===")
-    
-    results = benchmark.benchmark()
-    
+        print(f"=== MPI Pi Benchmark with {MPI.COMM_WORLD.Get_size()} nodes (seed {benchmark.seed}) ===")
+
+    results = benchmark.benchmark(max_points=int(args.max_points), repeats=args.repeats)
+
     if results and MPI.COMM_WORLD.Get_rank() == 0:
         import json
         with open(f'benchmark_{MPI.COMM_WORLD.Get_size()}nodes.json', 'w') as f:
-            json.dump(results, f, indent=2)
\ No newline at end of file
+            json.dump(results, f, indent=2)
+        if args.history:
+            from bench_history import pi_measurements, record_run
+            record_run(args.history, 'pi', pi_measurements(results), MPI.COMM_WORLD.Get_size(),
+                       args.hostfile, extra={'seed': benchmark.seed})
\ No newline at end of file
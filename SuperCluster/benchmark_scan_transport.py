@@ -0,0 +1,225 @@
+# benchmark_scan_transport.py
+"""Benchmark the scanner's result transfers: pickled objects vs packed buffers.
+
+security_scanner.py moves per-host records (small dicts) from the
+workers to rank 0 in two ways, and this times both with each transport
+on synthetic nmap-shaped records:
+
+- gather (static schedule): every rank hands rank 0 its whole result
+  list at the end; lowercase comm.gather of the pickled lists against
+  Gatherv of scan_wire-packed buffers
+- stream (dynamic/pipeline schedules): workers send records as they
+  finish, `--chunk` at a time; one lowercase isend per record (the
+  pickle transport) against one packed buffer per chunk
+
+Each leg is timed from a barrier until rank 0 holds every record as a
+dict again, so it covers encoding, transfer and decoding; bytes are
+what reached rank 0, and root CPU is rank 0's own processor time --
+the part that limits how many workers one master can keep up with.
+Run with at least two ranks, ideally across nodes (sharing cores with
+the workers makes rank 0 pay for their encoding in wall time too):
+
+    mpirun --hostfile hostfile -np 4 python benchmark_scan_transport.py --hosts 10000,50000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import pickle
+import random
+import time
+
+from mpi4py import MPI
+
+from bench_history import DEFAULT_HISTORY, measurement, record_run
+from scan_wire import decode_records, encode_records
+
+TAG_RECORD = 11
+TAG_BUFFER = 12
+TAG_DONE = 13
+
+SERVICES = [(22, "ssh", "OpenSSH", "8.9p1"), (80, "http", "nginx", "1.18.0"),
+            (443, "https", "nginx", "1.18.0"), (3389, "ms-wbt-server", "", ""),
+            (445, "microsoft-ds", "Samba smbd", "4.6.2"), (8080, "http-proxy", "", "")]
+
+
+def synthetic_records(count: int, offset: int = 0, up_fraction: float = 0.3,
+                      seed: int = 0) -> list[dict]:
+    """nmap-shaped records for 10.x.y.z addresses offset .. offset+count."""
+    rng = random.Random(seed + offset)
+    timestamp = "2024-01-01T00:00:00.000000"
+    records = []
+    for i in range(offset, offset + count):
+        up = rng.random() < up_fraction
+        ports = {}
+        if up:
+            for port, name, product, version in rng.sample(SERVICES, rng.randint(1, 4)):
+                ports[port] = {"state": rng.choice(("open", "open", "closed", "filtered")),
+                               "reason": "syn-ack", "name": name, "product": product,
+                               "version": version, "extrainfo": "", "conf": "10", "cpe": ""}
+        records.append({"ip": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+                        "status": "up" if up else "down", "ports": ports,
+                        "timestamp": timestamp})
+    return records
+
+
+def gather_pickle(comm, records):
+    """Lowercase gather of the pickled lists; (records on root, None: see pickled_bytes)."""
+    gathered = comm.gather(records, root=0)
+    if comm.Get_rank() != 0:
+        return None, 0
+    return [r for part in gathered for r in part], None
+
+
+def pickled_bytes(comm, records) -> int:
+    """Bytes gather_pickle moves to rank 0, counted outside the timed leg."""
+    # mpi4py pickles with the highest protocol; count the same bytes.
+    size = len(pickle.dumps(records, pickle.HIGHEST_PROTOCOL)) if comm.Get_rank() else 0
+    return comm.reduce(size, op=MPI.SUM, root=0)
+
+
+def gather_buffer(comm, records):
+    """Gatherv of packed buffers; (records on root, bytes received)."""
+    payload = encode_records(records)
+    counts = comm.gather(len(payload), root=0)
+    recv = None
+    if comm.Get_rank() == 0:
+        displs = [sum(counts[:i]) for i in range(len(counts))]
+        recv = bytearray(sum(counts))
+        comm.Gatherv([payload, MPI.BYTE], [recv, counts, displs, MPI.BYTE], root=0)
+        view = memoryview(recv)
+        merged = []
+        for count, displ in zip(counts, displs):
+            merged.extend(decode_records(view[displ:displ + count]))
+        return merged, sum(counts[1:])
+    comm.Gatherv([payload, MPI.BYTE], None, root=0)
+    return None, 0
+
+
+def stream_pickle(comm, records, chunk):
+    """One lowercase isend per record; (records on root, bytes received)."""
+    if comm.Get_rank() != 0:
+        for start in range(0, len(records), chunk):
+            MPI.Request.waitall([comm.isend(r, dest=0, tag=TAG_RECORD)
+                                 for r in records[start:start + chunk]])
+        comm.send(None, dest=0, tag=TAG_DONE)
+        return None, 0
+    return _drain(comm, records)
+
+
+def stream_buffer(comm, records, chunk):
+    """One packed buffer Send per chunk; (records on root, bytes received)."""
+    if comm.Get_rank() != 0:
+        for start in range(0, len(records), chunk):
+            payload = encode_records(records[start:start + chunk])
+            comm.Send([payload, MPI.BYTE], dest=0, tag=TAG_BUFFER)
+        comm.send(None, dest=0, tag=TAG_DONE)
+        return None, 0
+    return _drain(comm, records)
+
+
+def _drain(comm, own):
+    merged = list(own)
+    received = 0
+    status = MPI.Status()
+    running = comm.Get_size() - 1
+    while running:
+        message = comm.mprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
+        received += status.Get_count(MPI.BYTE)
+        if status.Get_tag() == TAG_BUFFER:
+            buf = bytearray(status.Get_count(MPI.BYTE))
+            message.Recv([buf, MPI.BYTE])
+            merged.extend(decode_records(buf))
+        elif status.Get_tag() == TAG_RECORD:
+            merged.append(message.recv())
+        else:
+            message.recv()
+            running -= 1
+    return merged, received
+
+
+def timed(comm, leg, *args, repeats=3):
+    """Best of `repeats` runs: (seconds, root CPU seconds, bytes, records, every run's root CPU) on rank 0."""
+    best = None
+    cpus = []
+    for _ in range(repeats):
+        comm.Barrier()
+        started, cpu = MPI.Wtime(), time.process_time()
+        merged, size = leg(comm, *args)
+        elapsed, cpu = MPI.Wtime() - started, time.process_time() - cpu
+        comm.Barrier()
+        cpus.append(cpu)
+        if comm.Get_rank() == 0 and (best is None or elapsed < best[0]):
+            best = (elapsed, cpu, size, len(merged))
+    if best is None:
+        return None
+    return best + (cpus,)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Pickled vs packed-buffer scan record transfers")
+    parser.add_argument("--hosts", default="1000,10000,50000",
+                        help="comma-separated total host counts, split over all ranks")
+    parser.add_argument("--chunk", type=int, default=64,
+                        help="stream legs: records a worker sends at once")
+    parser.add_argument("--up-fraction", type=float, default=0.3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("-o", "--output", default="scan_transport_benchmark.json")
+    parser.add_argument("--history", default=DEFAULT_HISTORY,
+                        help="append this run to the benchmark history (empty to skip)")
+    parser.add_argument("--hostfile", default="hostfile",
+                        help="hostfile the job was started with, hashed into the history entry")
+    args = parser.parse_args(argv)
+
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    if size < 2:
+        parser.error("run under mpirun with at least two ranks")
+
+    rows = []
+    for total in (int(h) for h in args.hosts.split(",")):
+        share, extra = divmod(total, size)
+        count = share + (rank < extra)
+        offset = rank * share + min(rank, extra)
+        records = synthetic_records(count, offset, args.up_fraction)
+        legs = [("gather", "pickle", gather_pickle, ()),
+                ("gather", "buffer", gather_buffer, ()),
+                ("stream", "pickle", stream_pickle, (args.chunk,)),
+                ("stream", "buffer", stream_buffer, (args.chunk,))]
+        for path, transport, leg, extra_args in legs:
+            best = timed(comm, leg, records, *extra_args, repeats=args.repeats)
+            counted = pickled_bytes(comm, records) if leg is gather_pickle else None
+            if rank == 0:
+                seconds, cpu, received, merged, cpus = best
+                received = counted if counted is not None else received
+                assert merged == total, (merged, total)
+                rows.append({"path": path, "transport": transport, "hosts": total,
+                             "ranks": size, "seconds": seconds, "root_cpu_seconds": cpu,
+                             "bytes": received, "root_cpu_samples": cpus,
+                             "hosts_per_second": total / seconds if seconds > 0 else None})
+                print(f"{path:>6} {transport:>6} {total:>8} hosts  {seconds:>8.4f}s  "
+                      f"root CPU {cpu:>8.4f}s  {received / 1e6:>8.2f} MB  "
+                      f"{total / seconds:>12.0f} hosts/s")
+
+    if rank == 0:
+        for path in ("gather", "stream"):
+            for metric in ("seconds", "root_cpu_seconds"):
+                pickled, packed = (sum(r[metric] for r in rows
+                                       if r["path"] == path and r["transport"] == transport)
+                                   for transport in ("pickle", "buffer"))
+                print(f"{path}: buffer transport is {pickled / packed:.2f}x as fast as pickle "
+                      f"({metric})")
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
+        if args.history:
+            record_run(args.history, "scan_transport",
+                       [measurement(f"{r['path']} {r['transport']} hosts={r['hosts']}",
+                                    "root_cpu_seconds", r["root_cpu_samples"],
+                                    higher_is_better=False) for r in rows],
+                       size, args.hostfile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+# connect_scan.py
+"""In-process asyncio TCP connect scanner.
+
+For quick port-state sweeps, spawning nmap per block is overkill: a
+single event loop can keep thousands of connect() calls in flight.
+ConnectScanner emits the same {'ip', 'status', 'ports', 'timestamp'}
+records as DistributedSecurityScanner.scan_batch, with per-port entries
+shaped like python-nmap's so downstream consumers need not care which
+engine produced them.
+
+A connect scan only sees open (handshake completed), closed (RST) and
+filtered (timeout/unreachable) ports; there is no service or OS
+detection.
+"""
+from __future__ import annotations
+
+import asyncio
+import socket
+import time
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_PORTS = (21, 22, 23, 25, 53, 80, 110, 139, 143, 443, 445, 993, 995,
+                 3306, 3389, 5432, 5900, 8080, 8443)
+
+
+def parse_ports(spec: str) -> tuple[int, ...]:
+    """Parse an nmap-style port list such as "22,80,8000-8100"."""
+    ports: list[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = (int(p) for p in part.split("-", 1))
+            ports.extend(range(lo, hi + 1))
+        else:
+            ports.append(int(part))
+    if any(not 0 < p < 65536 for p in ports):
+        raise ValueError(f"port out of range in {spec!r}")
+    return tuple(dict.fromkeys(ports))
+
+
+def _service_name(port: int) -> str:
+    try:
+        return socket.getservbyport(port, "tcp")
+    except OSError:
+        return ""
+
+
+class _HostPacer:
+    """Spaces connection attempts to one host at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float | None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ConnectScanner:
+    """Asyncio TCP connect scan of many hosts x ports in one event loop.
+
+    concurrency  -- connects in flight across all hosts (bounded by the
+                    process fd limit; raise `ulimit -n` for large values)
+    host_rate    -- max connection attempts per second to any one host
+                    (None for unlimited)
+    timeout      -- seconds before an unanswered connect counts as filtered
+    """
+
+    def __init__(self, ports=DEFAULT_PORTS, concurrency: int = 1000,
+                 host_rate: float | None = None, timeout: float = 1.0):
+        self.ports = tuple(ports)
+        self.concurrency = concurrency
+        self.host_rate = host_rate
+        self.timeout = timeout
+
+    def scan(self, ips: list[str], rate: float | None = None,
+             stats: Counter | None = None) -> list[dict]:
+        """Scan ips and return one record per address, in input order.
+
+        rate  -- max connection attempts per second across all of ips
+        stats -- Counter; gets 'probes' and 'timeouts' added for every
+                 host that answered at least one probe
+        """
+        return asyncio.run(self.scan_async(ips, rate, stats))
+
+    async def scan_async(self, ips: list[str], rate: float | None = None,
+                         stats: Counter | None = None) -> list[dict]:
+        limit = asyncio.Semaphore(self.concurrency)
+        # Shared by every host, so it caps the whole call, not one host.
+        pacer = _HostPacer(rate)
+        return await asyncio.gather(*(self._scan_host(ip, limit, pacer, stats) for ip in ips))
+
+    async def _scan_host(self, ip: str, limit: asyncio.Semaphore, pacer: _HostPacer,
+                         stats: Counter | None) -> dict:
+        host_pacer = _HostPacer(self.host_rate)
+        tasks = []
+        for port in self.ports:
+            await host_pacer.wait()
+            await pacer.wait()
+            tasks.append(asyncio.ensure_future(self._probe(ip, port, limit)))
+        states = await asyncio.gather(*tasks)
+
+        ports = {}
+        responded = False
+        for port, (state, reason) in zip(self.ports, states):
+            responded = responded or state in ("open", "closed")
+            if state == "open":
+                ports[port] = {
+                    "state": "open",
+                    "reason": reason,
+                    "name": _service_name(port),
+                    "product": "",
+                    "version": "",
+                    "extrainfo": "",
+                    "conf": "3",
+                    "cpe": "",
+                }
+        if stats is not None and responded:
+            stats["probes"] += len(states)
+            stats["timeouts"] += sum(1 for _, reason in states if reason == "no-response")
+        return {
+            "ip": ip,
+            "status": "up" if responded else "down",
+            "ports": ports,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    async def _probe(self, ip: str, port: int, limit: asyncio.Semaphore) -> tuple[str, str]:
+        async with limit:
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port), timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                return "filtered", "no-response"
+            except ConnectionRefusedError:
+                return "closed", "conn-refused"
+            except OSError:
+                # Host/network unreachable and friends.
+                return "filtered", "unreach"
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return "open", "syn-ack"
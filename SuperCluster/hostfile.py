@@ -0,0 +1,80 @@
+# hostfile.py
+"""Open MPI hostfile parsing shared by the SuperCluster tools.
+
+Lines look like `192.168.1.2 slots=2 max_slots=4   # comment`. Only the
+first token is required; `slots` defaults to 1 as in Open MPI. SuperCluster
+settings that mpirun must not see go in the comment as key=value pairs,
+e.g. `# subnets=10.0.1.0/24`.
+"""
+from __future__ import annotations
+
+import socket
+from dataclasses import dataclass, field
+
+
+@dataclass
+class HostEntry:
+    host: str
+    slots: int = 1
+    max_slots: int | None = None
+    # Any other key=value pairs on the line, before the comment.
+    attrs: dict[str, str] = field(default_factory=dict)
+    comment: str = ""
+
+    @property
+    def annotations(self) -> dict[str, str]:
+        """key=value pairs found in the comment."""
+        pairs = (token.partition("=") for token in self.comment.split())
+        return {key: value for key, sep, value in pairs if sep}
+
+
+def parse_hostfile_lines(lines) -> list[HostEntry]:
+    entries = []
+    for line in lines:
+        body, _, comment = line.partition("#")
+        parts = body.split()
+        if not parts:
+            continue
+        entry = HostEntry(parts[0], comment=comment.strip())
+        for token in parts[1:]:
+            key, sep, value = token.partition("=")
+            if not sep:
+                continue
+            if key == "slots":
+                entry.slots = int(value)
+            elif key == "max_slots":
+                entry.max_slots = int(value)
+            else:
+                entry.attrs[key] = value
+        entries.append(entry)
+    return entries
+
+
+def parse_hostfile(path: str = "hostfile") -> list[HostEntry]:
+    """Parse a hostfile; a missing file yields an empty list."""
+    try:
+        with open(path, "r") as f:
+            return parse_hostfile_lines(f)
+    except FileNotFoundError:
+        return []
+
+
+def local_names(extra: tuple[str, ...] = ()) -> set[str]:
+    """Names and addresses this machine may appear under in a hostfile."""
+    names = {"localhost", "127.0.0.1", *extra}
+    hostname = socket.gethostname()
+    names.update({hostname, hostname.split(".")[0], socket.getfqdn()})
+    try:
+        names.update(socket.gethostbyname_ex(hostname)[2])
+    except OSError:
+        pass
+    return names
+
+
+def find_local_entry(entries: list[HostEntry], extra_names: tuple[str, ...] = ()) -> HostEntry | None:
+    """The hostfile entry describing this machine, if any."""
+    names = local_names(extra_names)
+    for entry in entries:
+        if entry.host in names:
+            return entry
+    return None
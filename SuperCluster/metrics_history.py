@@ -0,0 +1,246 @@
+# metrics_history.py
+"""Fixed-memory time series of the cluster monitor's metrics.
+
+Every (node, metric) series lives in a preallocated slot of one flat
+float64 buffer, so the store never grows: a bytearray in memory, or a
+memory-mapped file that survives restarts. Each slot holds three ring
+buffers (tiers):
+
+    raw   every sample as (t, value)                   720 samples
+    1m    one (t, mean, min, max) per minute           1440 minutes (1 day)
+    1h    one (t, mean, min, max) per hour             720 hours (30 days)
+
+Rollups are accumulated from the raw samples as they arrive and
+written when a sample opens the next minute or hour; queries append the
+bucket still in progress, so the newest rollup point may be partial.
+Timestamps are Unix seconds and must not go backwards within a series
+(older samples are ignored), which keeps every ring sorted and lets
+range queries bisect instead of scanning.
+
+File layout (native byte order):
+
+    header   "SCTS", version, max series, tier count,
+             then (bucket seconds, capacity) per tier, padded to 8 bytes
+    keys     max series x 64 bytes: "node\\0metric", UTF-8, NUL padded
+    data     max series x slot, float64:
+             per tier (head, count); per rollup tier the open bucket
+             (start, sum, n, min, max); then the rings in tier order
+
+A file written with other limits is refused rather than reinterpreted.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+
+MAGIC = b"SCTS"
+VERSION = 1
+KEY_BYTES = 64
+# (name, bucket seconds, capacity); bucket 0 keeps raw samples.
+TIERS = (("raw", 0, 720), ("1m", 60, 1440), ("1h", 3600, 720))
+_HEADER = struct.Struct("=4sIII")
+_TIER = struct.Struct("=II")
+_ACC = 5  # open bucket: start, sum, n, min, max
+
+
+class _Times:
+    """Timestamps of one ring, oldest first, as a sequence for bisect."""
+
+    def __init__(self, data, ring: int, width: int, capacity: int, head: int, count: int):
+        self.data, self.ring, self.width, self.capacity = data, ring, width, capacity
+        self.first, self.count = head - count, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k: int) -> float:
+        return self.data[self.ring + (self.first + k) % self.capacity * self.width]
+
+
+class MetricsHistory:
+    """Ring-buffer store of (node, metric) series; see the module docstring."""
+
+    def __init__(self, max_series: int = 256, path: str | None = None, tiers=TIERS):
+        if not tiers or tiers[0][1] != 0:
+            raise ValueError("the first tier must hold raw samples (bucket 0)")
+        self.tiers = tuple(tiers)
+        self.max_series = max_series
+        self.path = path
+        self.dropped = 0  # samples refused for want of a slot (see record)
+        self._widths = [2 if bucket == 0 else 4 for _, bucket, _ in self.tiers]
+        self._acc_base = 2 * len(self.tiers)
+        offset = self._acc_base + _ACC * (len(self.tiers) - 1)
+        self._rings = []
+        for width, (_, _, capacity) in zip(self._widths, self.tiers):
+            self._rings.append(offset)
+            offset += width * capacity
+        self._stride = offset
+
+        header = _HEADER.pack(MAGIC, VERSION, max_series, len(self.tiers)) + b"".join(
+            _TIER.pack(bucket, capacity) for _, bucket, capacity in self.tiers)
+        header_size = -(-len(header) // 8) * 8
+        keys_size = max_series * KEY_BYTES
+        size = header_size + keys_size + max_series * self._stride * 8
+        self._mmap = None
+        if path is None:
+            buf = bytearray(size)
+            buf[:len(header)] = header
+        else:
+            buf = self._mmap = self._map(path, header, size)
+        view = memoryview(buf)
+        self._keys = view[header_size:header_size + keys_size]
+        self._data = view[header_size + keys_size:].cast("d")
+        self._lock = threading.Lock()
+        self._index: dict[tuple[str, str], int] = {}
+        for slot in range(max_series):
+            key = bytes(self._keys[slot * KEY_BYTES:(slot + 1) * KEY_BYTES]).rstrip(b"\0")
+            if not key:
+                break
+            node, metric = key.decode("utf-8").split("\0", 1)
+            self._index[node, metric] = slot
+
+    @staticmethod
+    def _map(path: str, header: bytes, size: int) -> mmap.mmap:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing and (existing != size or os.pread(fd, len(header), 0) != header):
+                raise ValueError(f"{path} holds metrics history with different limits; "
+                                 "move it away or start with the settings that wrote it")
+            if not existing:
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+            return mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _slot(self, node: str, metric: str) -> int | None:
+        """Slot of a series, allocated on first use; None if none is free or the name does not fit."""
+        slot = self._index.get((node, metric))
+        if slot is None and len(self._index) < self.max_series:
+            key = f"{node}\0{metric}".encode("utf-8")
+            if len(key) > KEY_BYTES or "\0" in node:
+                return None
+            slot = len(self._index)
+            self._keys[slot * KEY_BYTES:slot * KEY_BYTES + len(key)] = key
+            self._index[node, metric] = slot
+        return slot
+
+    def _append(self, base: int, tier: int, values) -> None:
+        data = self._data
+        head, count = int(data[base + 2 * tier]), int(data[base + 2 * tier + 1])
+        capacity = self.tiers[tier][2]
+        position = base + self._rings[tier] + head * self._widths[tier]
+        for k, value in enumerate(values):
+            data[position + k] = value
+        data[base + 2 * tier] = (head + 1) % capacity
+        data[base + 2 * tier + 1] = min(count + 1, capacity)
+
+    def record(self, node: str, metric: str, t: float, value: float) -> bool:
+        """Add one sample; False if it is older than the series' newest or has no slot.
+
+        A series gets no slot when every slot is taken or its
+        "node\\0metric" name exceeds KEY_BYTES; both count in dropped.
+        """
+        value = float(value)
+        with self._lock:
+            slot = self._slot(node, metric)
+            if slot is None:
+                self.dropped += 1
+                return False
+            data, base = self._data, slot * self._stride
+            head, count = int(data[base]), int(data[base + 1])
+            if count:
+                newest = base + self._rings[0] + (head - 1) % self.tiers[0][2] * 2
+                if t < data[newest]:
+                    return False
+            self._append(base, 0, (t, value))
+            for tier in range(1, len(self.tiers)):
+                bucket = self.tiers[tier][1]
+                acc = base + self._acc_base + _ACC * (tier - 1)
+                start = t - t % bucket
+                if data[acc + 2] and data[acc] != start:
+                    n = data[acc + 2]
+                    self._append(base, tier, (data[acc], data[acc + 1] / n,
+                                              data[acc + 3], data[acc + 4]))
+                    data[acc + 2] = 0
+                if data[acc + 2]:
+                    data[acc + 1] += value
+                    data[acc + 2] += 1
+                    data[acc + 3] = min(data[acc + 3], value)
+                    data[acc + 4] = max(data[acc + 4], value)
+                else:
+                    data[acc], data[acc + 1], data[acc + 2] = start, value, 1
+                    data[acc + 3] = data[acc + 4] = value
+        return True
+
+    def series(self) -> list[tuple[str, str]]:
+        with self._lock:
+            return sorted(self._index)
+
+    def resolutions(self) -> list[str]:
+        return [name for name, _, _ in self.tiers]
+
+    def _oldest(self, base: int, tier: int) -> float | None:
+        head, count = int(self._data[base + 2 * tier]), int(self._data[base + 2 * tier + 1])
+        if not count:
+            return None
+        capacity = self.tiers[tier][2]
+        return self._data[base + self._rings[tier] + (head - count) % capacity * self._widths[tier]]
+
+    def query(self, node: str, metric: str, start: float | None = None, end: float | None = None,
+              resolution: str = "auto") -> tuple[str, list[str], list[list[float]]]:
+        """(resolution, column names, points) of one series between start and end, inclusive.
+
+        "auto" picks the finest tier that still reaches back to start,
+        or the one reaching furthest back if none does. KeyError for an
+        unknown series or resolution.
+        """
+        names = self.resolutions()
+        with self._lock:
+            slot = self._index[node, metric]
+            data, base = self._data, slot * self._stride
+            if resolution == "auto":
+                reach = [(self._oldest(base, tier), tier) for tier in range(len(self.tiers))]
+                reach = [(oldest, tier) for oldest, tier in reach if oldest is not None]
+                tier = 0
+                if start is not None and reach:
+                    covering = [tier for oldest, tier in reach if oldest <= start]
+                    tier = covering[0] if covering else min(reach)[1]
+            elif resolution in names:
+                tier = names.index(resolution)
+            else:
+                raise KeyError(resolution)
+
+            width, capacity = self._widths[tier], self.tiers[tier][2]
+            ring = base + self._rings[tier]
+            times = _Times(data, ring, width, capacity, int(data[base + 2 * tier]),
+                           int(data[base + 2 * tier + 1]))
+            lo = 0 if start is None else bisect_left(times, start)
+            hi = len(times) if end is None else bisect_right(times, end)
+            points = []
+            for k in range(lo, hi):
+                position = ring + (times.first + k) % capacity * width
+                points.append(data[position:position + width].tolist())
+            if tier:
+                acc = base + self._acc_base + _ACC * (tier - 1)
+                n = data[acc + 2]
+                if n and (start is None or data[acc] >= start) and (end is None or data[acc] <= end):
+                    points.append([data[acc], data[acc + 1] / n, data[acc + 3], data[acc + 4]])
+        columns = ["t", "value"] if width == 2 else ["t", "mean", "min", "max"]
+        return names[tier], columns, points
+
+    def flush(self) -> None:
+        """Write a memory-mapped store's pages to its file now."""
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._data.release()
+            self._keys.release()
+            self._mmap.close()
+            self._mmap = None
@@ -1,12 +1,21 @@
 # monitor_cluster.py
 import ipaddress
+import json
+import math
+import os
 import re
 import shlex
 import socket
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
-from flask import Flask, jsonify, render_template
+from flask import Flask, Response, jsonify, render_template, request
+
+from metrics_history import MetricsHistory
+from node_agent import DEFAULT_PORT as AGENT_PORT, AgentListener
 
 # psutil is imported lazily inside the function that uses it. This lets
 # the fuzz harness import the validation primitive `_validate_scan_target`
@@ -52,11 +61,38 @@ def _validate_scan_target(target):
 
 
 class ClusterMonitor:
-    def __init__(self, hostfile: str = "hostfile"):
+    def __init__(
+        self,
+        hostfile: str = "hostfile",
+        probe_timeout: float = 2.0,
+        probe_workers: int = 64,
+        probe_deadline: float | None = None,
+        agents: AgentListener | None = None,
+    ):
         # nodes loaded lazily so the module is importable in test/fuzz
         # contexts where the hostfile isn't present.
         self._hostfile = hostfile
         self.nodes: list[str] | None = None
+        # Nodes are probed concurrently on up to probe_workers threads, so
+        # a sweep takes about one probe_timeout per probe_workers offline
+        # nodes. probe_deadline bounds the whole sweep; by default it
+        # allows every wave of workers one probe_timeout, so a large
+        # cluster is never cut short. Nodes not reached by the deadline
+        # report "unknown".
+        self.probe_timeout = probe_timeout
+        self.probe_workers = probe_workers
+        self._probe_deadline = probe_deadline
+        # Per-node CPU/memory/load/network/disk from node_agent.py; the
+        # listener binds on the first collection, not at construction.
+        self.agents = agents
+
+    @property
+    def probe_deadline(self) -> float:
+        """Seconds a sweep of every hostfile node may take"""
+        if self._probe_deadline is not None:
+            return self._probe_deadline
+        waves = math.ceil(len(self._ensure_nodes()) / self.probe_workers) or 1
+        return waves * self.probe_timeout + 1.0
 
     def _ensure_nodes(self) -> list[str]:
         if self.nodes is None:
@@ -77,38 +113,305 @@ class ClusterMonitor:
     def get_node_status(self, node_ip):
         """Check if node is responsive"""
         try:
-            socket.create_connection((node_ip, 22), timeout=2)
-            return "online"
+            with socket.create_connection((node_ip, 22), timeout=self.probe_timeout):
+                return "online"
         except (OSError, socket.error, socket.timeout):
             return "offline"
 
+    def probe_nodes(self, nodes):
+        """Status of every node, probed concurrently within probe_deadline"""
+        if not nodes:
+            return {}
+        pool = ThreadPoolExecutor(max_workers=min(self.probe_workers, len(nodes)))
+        futures = {pool.submit(self.get_node_status, node): node for node in nodes}
+        done, _ = wait(futures, timeout=self.probe_deadline)
+        # Don't wait for stragglers; each one ends within probe_timeout anyway.
+        pool.shutdown(wait=False, cancel_futures=True)
+        return {node: future.result() if future in done else "unknown"
+                for future, node in futures.items()}
+
+    def node_resources(self, node):
+        """Latest agent report for a node, or None if its agent is silent"""
+        if self.agents is None:
+            return None
+        sample = self.agents.latest(node)
+        if sample is None:
+            return None
+        # Frames carry float32; round away the noise that adds to every delta.
+        resources = {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in sample.items()
+            if key != "received"
+        }
+        resources["age_seconds"] = round(time.time() - sample["received"], 3)
+        return resources
+
     def get_cluster_metrics(self):
         # Lazy import: psutil is only needed for runtime metrics, not for
         # the validation primitive or fuzz harness.
         import psutil  # type: ignore  # noqa: WPS433,PLC0415
 
         nodes = self._ensure_nodes()
+        if self.agents is not None:
+            self.agents.allow(nodes)
+            self.agents.start()
         metrics = {
             "timestamp": datetime.now().isoformat(),
             "total_nodes": len(nodes),
             "online_nodes": 0,
+            "reporting_nodes": 0,
+            "metrics_source": "master",
             "cpu_usage": psutil.cpu_percent(),
             "memory_usage": psutil.virtual_memory().percent,
             "nodes": [],
         }
 
+        statuses = self.probe_nodes(nodes)
+        reports = []
         for node in nodes:
-            status = self.get_node_status(node)
+            status = statuses[node]
             if status == "online":
                 metrics["online_nodes"] += 1
-            metrics["nodes"].append(
-                {"ip": node, "status": status, "last_check": datetime.now().isoformat()}
+            entry = {"ip": node, "status": status, "last_check": datetime.now().isoformat()}
+            resources = self.node_resources(node)
+            if resources is not None:
+                entry["resources"] = resources
+                reports.append(resources)
+            metrics["nodes"].append(entry)
+
+        # With agents reporting, the cluster figures cover the nodes that
+        # report rather than whichever machine runs the dashboard.
+        if reports:
+            memory_total = sum(r["memory_total"] for r in reports)
+            metrics.update(
+                reporting_nodes=len(reports),
+                metrics_source="agents",
+                cpu_usage=round(sum(r["cpu_percent"] for r in reports) / len(reports), 1),
+                memory_usage=round(
+                    100.0 * sum(r["memory_used"] for r in reports) / memory_total, 1
+                ) if memory_total else 0.0,
+                net_sent_bps=sum(r["net_sent_bps"] for r in reports),
+                net_recv_bps=sum(r["net_recv_bps"] for r in reports),
+                disk_read_bps=sum(r["disk_read_bps"] for r in reports),
+                disk_write_bps=sum(r["disk_write_bps"] for r in reports),
             )
 
         return metrics
 
 
-monitor = ClusterMonitor()
+class MetricsCollector:
+    """Refreshes a ClusterMonitor's metrics on a background thread.
+
+    Readers get the latest snapshot without probing anything, so the
+    cost of a request no longer grows with the number of viewers. The
+    thread starts on the first snapshot() call, not at import, so
+    importing this module (fuzz harness, tests) stays side-effect free.
+
+    Each collection is also recorded in a MetricsHistory (in memory, or
+    memory-mapped at history_path), allocated when the thread starts.
+    """
+
+    def __init__(
+        self,
+        monitor: ClusterMonitor,
+        interval: float = 5.0,
+        history_path: str | None = None,
+        history_series: int = 256,
+    ):
+        self.monitor = monitor
+        self.interval = interval
+        self.history_path = history_path
+        self.history_series = history_series
+        self.history: MetricsHistory | None = None
+        self._snapshot: dict | None = None
+        self._collected_at = 0.0  # time.monotonic() of the snapshot
+        self._error: str | None = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Every successful collection bumps the version and records what
+        # changed since the previous one, for the event stream.
+        self._version = 0
+        self._delta: dict | None = None
+        self._published = threading.Condition()
+
+    def start(self):
+        with self._lock:
+            if self.history is None:
+                self.history = self._open_history()
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-collector", daemon=True
+                )
+                self._thread.start()
+
+    def _open_history(self) -> MetricsHistory:
+        if self.history_path:
+            try:
+                return MetricsHistory(self.history_series, self.history_path)
+            except (OSError, ValueError) as e:
+                print(f"monitor_cluster: keeping metrics history in memory: {e}")
+        return MetricsHistory(self.history_series)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                snapshot = self.monitor.get_cluster_metrics()
+            except Exception as e:  # keep serving the last good snapshot
+                self._error = f"{type(e).__name__}: {e}"
+            else:
+                try:
+                    self._publish(snapshot)
+                    self._record_history(snapshot, time.time())
+                except Exception as e:  # history bookkeeping must not stop refreshes
+                    self._error = f"{type(e).__name__}: {e}"
+            finally:
+                self._ready.set()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _publish(self, snapshot):
+        previous = self._snapshot
+        delta = None
+        if previous is not None:
+            delta = {
+                "timestamp": snapshot["timestamp"],
+                "metrics": {
+                    key: value
+                    for key, value in snapshot.items()
+                    if key not in ("nodes", "timestamp") and previous.get(key) != value
+                },
+            }
+            # last_check and the report age move every round; only status
+            # and resource changes are news.
+            before = {node["ip"]: _comparable(node) for node in previous["nodes"]}
+            delta["nodes"] = [
+                node
+                for node in snapshot["nodes"]
+                if before.pop(node["ip"], None) != _comparable(node)
+            ]
+            delta["removed"] = sorted(before)
+        with self._published:
+            self._snapshot, self._collected_at, self._error = snapshot, time.monotonic(), None
+            self._version += 1
+            self._delta = delta
+            self._published.notify_all()
+
+    def _record_history(self, snapshot, now):
+        for node, metric, value in _history_points(snapshot):
+            self.history.record(node, metric, now, value)
+
+    def events(self, last_version: int | None = None, heartbeat: float = 15.0):
+        """Server-Sent Events: a full snapshot, then one delta per collection.
+
+        A client that fell behind by more than one collection (or
+        reconnects with an old Last-Event-ID) gets a fresh snapshot
+        instead of the deltas it missed. A comment line every heartbeat
+        seconds keeps idle connections (and proxies) open.
+        """
+        self.start()
+        seen = last_version
+        while True:
+            with self._published:
+                if self._snapshot is None or self._version == seen:
+                    self._published.wait(heartbeat)
+                version, snapshot, delta = self._version, self._snapshot, self._delta
+            if snapshot is None or version == seen:
+                yield ": keep-alive\n\n"
+                continue
+            if seen is not None and version == seen + 1 and delta is not None:
+                yield _sse("delta", delta, version)
+            else:
+                yield _sse("snapshot", snapshot, version)
+            seen = version
+
+    def snapshot(self, timeout: float | None = None):
+        """Latest metrics plus their age, or None if none were collected in time.
+
+        Waits (up to timeout, default one probe deadline) only until the
+        very first collection finishes.
+        """
+        self.start()
+        if timeout is None:
+            timeout = self.monitor.probe_deadline + 1.0
+        self._ready.wait(timeout)
+        snapshot, collected_at = self._snapshot, self._collected_at
+        if snapshot is None:
+            return None
+        age = time.monotonic() - collected_at
+        return {
+            **snapshot,
+            "age_seconds": round(age, 3),
+            "stale": age > 2 * self.interval + self.monitor.probe_deadline,
+            "collector_error": self._error,
+        }
+
+
+# Per-node agent fields kept in the history, next to each node's "up".
+HISTORY_RESOURCES = (
+    "cpu_percent", "memory_percent", "load1", "net_sent_bps", "net_recv_bps",
+    "disk_read_bps", "disk_write_bps",
+)
+HISTORY_CLUSTER = (
+    "online_nodes", "reporting_nodes", "cpu_usage", "memory_usage",
+    "net_sent_bps", "net_recv_bps", "disk_read_bps", "disk_write_bps",
+)
+
+
+def _history_points(snapshot: dict):
+    """(node, metric, value) of one snapshot; cluster-wide figures under node "cluster"."""
+    for metric in HISTORY_CLUSTER:
+        if metric in snapshot:
+            yield "cluster", metric, snapshot[metric]
+    for node in snapshot["nodes"]:
+        yield node["ip"], "up", 1.0 if node["status"] == "online" else 0.0
+        resources = node.get("resources")
+        if resources:
+            for metric in HISTORY_RESOURCES:
+                yield node["ip"], metric, resources[metric]
+
+
+def _comparable(node: dict) -> dict:
+    node = {key: value for key, value in node.items() if key != "last_check"}
+    if "resources" in node:
+        node["resources"] = {
+            key: value for key, value in node["resources"].items() if key != "age_seconds"
+        }
+    return node
+
+
+def _sse(event: str, data: dict, event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# node_agent.py frames arrive on MONITOR_AGENT_BIND:MONITOR_AGENT_PORT
+# (bind the cluster-facing address) and must be signed with
+# MONITOR_AGENT_KEY; without a key the listener stays off unless
+# MONITOR_AGENT_UNSIGNED=1 accepts unsigned frames from node addresses.
+_agent_key = os.environ.get("MONITOR_AGENT_KEY")
+monitor = ClusterMonitor(
+    agents=AgentListener(
+        port=int(os.environ.get("MONITOR_AGENT_PORT", AGENT_PORT)),
+        host=os.environ.get("MONITOR_AGENT_BIND", "0.0.0.0"),
+        key=_agent_key.encode() if _agent_key else None,
+        allow_unsigned=os.environ.get("MONITOR_AGENT_UNSIGNED") == "1",
+    )
+)
+# Seconds between background refreshes of /api/metrics.
+# MONITOR_HISTORY_FILE keeps the metrics history in a memory-mapped file
+# across restarts; MONITOR_HISTORY_SERIES caps the (node, metric) series
+# (about 80 KB each, allocated up front).
+collector = MetricsCollector(
+    monitor,
+    interval=float(os.environ.get("MONITOR_INTERVAL", "5")),
+    history_path=os.environ.get("MONITOR_HISTORY_FILE") or None,
+    history_series=int(os.environ.get("MONITOR_HISTORY_SERIES", "256")),
+)
 
 
 @app.route("/")
@@ -118,7 +421,61 @@ def dashboard():
 
 @app.route("/api/metrics")
 def get_metrics():
-    return jsonify(monitor.get_cluster_metrics())
+    snapshot = collector.snapshot()
+    if snapshot is None:
+        return jsonify({"error": "metrics not collected yet"}), 503
+    return jsonify(snapshot)
+
+
+@app.route("/api/metrics/stream")
+def stream_metrics():
+    """Server-Sent Events: `snapshot` once, then a `delta` per refresh"""
+    last = request.headers.get("Last-Event-ID", "")
+    return Response(
+        collector.events(int(last) if last.isdigit() else None),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _time_arg(name):
+    """Unix seconds from the query string; zero or negative counts back from now"""
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return None
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(name)
+    return time.time() + value if value <= 0 else value
+
+
+@app.route("/api/metrics/history")
+def metrics_history():
+    """Stored series, or one series' points: ?node=&metric=&start=&end=&resolution="""
+    collector.start()
+    history = collector.history
+    node, metric = request.args.get("node"), request.args.get("metric")
+    if not node or not metric:
+        return jsonify(
+            {
+                "series": [{"node": n, "metric": m} for n, m in history.series()],
+                "resolutions": ["auto", *history.resolutions()],
+            }
+        )
+    resolution = request.args.get("resolution", "auto")
+    if resolution not in ("auto", *history.resolutions()):
+        return jsonify({"error": "Invalid resolution"}), 400
+    try:
+        start, end = _time_arg("start"), _time_arg("end")
+    except ValueError:
+        return jsonify({"error": "start and end must be Unix seconds"}), 400
+    try:
+        used, columns, points = history.query(node, metric, start, end, resolution)
+    except KeyError:
+        return jsonify({"error": "Unknown series"}), 404
+    return jsonify(
+        {"node": node, "metric": metric, "resolution": used, "columns": columns, "points": points}
+    )
 
 
 @app.route("/api/run_scan/<target>")
@@ -0,0 +1,256 @@
+# node_agent.py
+"""Per-node resource agent for the cluster monitor.
+
+Each node runs a small agent that samples its own CPU, memory, load,
+network and disk every few seconds and sends one fixed-size binary
+frame per sample to the master over UDP. monitor_cluster.py listens
+for the frames (AgentListener) and reports every node's utilisation
+instead of the master's psutil numbers alone.
+
+Start one agent per node, by hand or through MPI:
+
+    python node_agent.py --master 10.0.0.1
+    mpirun --hostfile hostfile -npernode 1 python node_agent.py --master 10.0.0.1
+
+Frame (network byte order, 74 bytes plus the hostname):
+
+    magic "SCA1", version, flags, hostname length     4s B B H
+    timestamp                                         d
+    cpu %, memory %, memory used, memory total        f f Q Q
+    load 1/5/15 min                                   f f f
+    net sent/recv bytes/s, disk read/write bytes/s    f f f f
+    root filesystem used %, CPU count                 f H
+    hostname (UTF-8), then a 16-byte HMAC-SHA256 tag if flags & 1
+
+Set the same shared key on both sides (--key, or MONITOR_AGENT_KEY):
+the listener only runs without one when explicitly allowed to take
+unsigned frames. It keeps reports only for hostfile nodes: a signed
+frame counts for the node it names, else for its sender address, and
+must be stamped within max_skew seconds of the master's clock and newer
+than the node's last report while that is fresh (no replays); an
+unsigned frame only counts for the node whose address sent it.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import os
+import socket
+import struct
+import threading
+import time
+
+MAGIC = b"SCA1"
+VERSION = 1
+FLAG_SIGNED = 1
+DEFAULT_PORT = 5140
+_HEADER = struct.Struct("!4sBBH")
+_BODY = struct.Struct("!dffQQ8fH")
+_TAG_BYTES = 16
+FIELDS = ("timestamp", "cpu_percent", "memory_percent", "memory_used", "memory_total",
+          "load1", "load5", "load15", "net_sent_bps", "net_recv_bps",
+          "disk_read_bps", "disk_write_bps", "disk_percent", "cpu_count")
+
+
+def encode_frame(hostname: str, sample: dict, key: bytes | None = None) -> bytes:
+    """One sample (FIELDS) as a binary frame, signed when key is given."""
+    name = hostname.encode("utf-8")[:255]
+    frame = (_HEADER.pack(MAGIC, VERSION, FLAG_SIGNED if key else 0, len(name))
+             + _BODY.pack(*(sample[f] for f in FIELDS)) + name)
+    if key:
+        frame += hmac.new(key, frame, hashlib.sha256).digest()[:_TAG_BYTES]
+    return frame
+
+
+def decode_frame(frame: bytes, key: bytes | None = None) -> dict:
+    """Inverse of encode_frame; ValueError for malformed, unsigned (with a key) or forged frames."""
+    if len(frame) < _HEADER.size + _BODY.size:
+        raise ValueError("short frame")
+    magic, version, flags, name_len = _HEADER.unpack_from(frame)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not an agent frame")
+    end = _HEADER.size + _BODY.size + name_len
+    signed = flags & FLAG_SIGNED
+    if len(frame) != end + (_TAG_BYTES if signed else 0):
+        raise ValueError("bad frame length")
+    if key:
+        expected = hmac.new(key, frame[:end], hashlib.sha256).digest()[:_TAG_BYTES]
+        if not signed or not hmac.compare_digest(frame[end:], expected):
+            raise ValueError("bad frame signature")
+    sample = dict(zip(FIELDS, _BODY.unpack_from(frame, _HEADER.size)))
+    sample["hostname"] = frame[_HEADER.size + _BODY.size:end].decode("utf-8", "replace")
+    return sample
+
+
+class ResourceSampler:
+    """psutil readings; counters become per-second rates between calls."""
+
+    def __init__(self, disk_path: str = "/"):
+        import psutil  # only agents need psutil at sampling time
+
+        self._psutil = psutil
+        self.disk_path = disk_path
+        self._last = None
+        psutil.cpu_percent()  # the first call only primes the counter
+
+    def sample(self) -> dict:
+        psutil = self._psutil
+        now = time.time()
+        net = psutil.net_io_counters()
+        disk = psutil.disk_io_counters()
+        counters = (now, net.bytes_sent, net.bytes_recv,
+                    disk.read_bytes if disk else 0, disk.write_bytes if disk else 0)
+        rates = [0.0] * 4
+        if self._last is not None:
+            elapsed = max(now - self._last[0], 1e-6)
+            rates = [max(0.0, (c - p) / elapsed) for c, p in zip(counters[1:], self._last[1:])]
+        self._last = counters
+        memory = psutil.virtual_memory()
+        load = os.getloadavg() if hasattr(os, "getloadavg") else (0.0, 0.0, 0.0)
+        return dict(zip(FIELDS, (
+            now, psutil.cpu_percent(), memory.percent, memory.used, memory.total,
+            *load, *rates, psutil.disk_usage(self.disk_path).percent, psutil.cpu_count() or 1,
+        )))
+
+
+class AgentListener:
+    """Receives agent frames on a UDP port and keeps each node's latest sample.
+
+    allow() names the hostfile nodes; frames for anything else are
+    rejected, so memory stays bounded by the node count. Samples older
+    than stale_after seconds are neither reported nor kept. Keep
+    max_skew below stale_after: a signed frame replayed after its node's
+    report went stale is only refused by the skew window.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "0.0.0.0",
+                 key: bytes | None = None, stale_after: float = 15.0,
+                 max_skew: float = 10.0, allow_unsigned: bool = False):
+        self.port = port
+        self.host = host
+        self.key = key
+        self.stale_after = stale_after
+        self.max_skew = max_skew
+        self.allow_unsigned = allow_unsigned
+        self.rejected = 0
+        self._nodes: frozenset[str] = frozenset()
+        self._addresses: dict[str, str] = {}  # sender address -> hostfile node
+        self._samples: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def allow(self, nodes) -> None:
+        """Accept reports for these hostfile entries (addresses or hostnames) only."""
+        nodes = frozenset(nodes)
+        if nodes == self._nodes:
+            return
+        addresses = {}
+        for node in nodes:
+            try:
+                addresses.setdefault(socket.gethostbyname(node), node)
+            except OSError:
+                pass  # unresolvable: only a signed hostname match reaches it
+        with self._lock:
+            self._nodes, self._addresses = nodes, addresses
+            self._samples = {n: s for n, s in self._samples.items() if n in nodes}
+
+    def start(self) -> bool:
+        """Bind and start the receive thread; False if the port is unavailable or no key is set."""
+        if self.key is None and not self.allow_unsigned:
+            return False
+        with self._lock:
+            if self._thread is not None:
+                return True
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((self.host, self.port))
+            except OSError:
+                sock.close()
+                return False
+            self._sock = sock
+            self._thread = threading.Thread(target=self._run, name="agent-listener", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        while True:
+            try:
+                frame, (address, _) = self._sock.recvfrom(2048)
+            except OSError:
+                return  # socket closed
+            try:
+                sample = decode_frame(frame, self.key)
+            except ValueError:
+                self.rejected += 1
+                continue
+            if not self._accept(address, sample, time.time()):
+                self.rejected += 1
+
+    def _accept(self, address: str, sample: dict, now: float) -> bool:
+        with self._lock:
+            # Only a signed frame may name its node; otherwise the sender does.
+            if self.key is not None and sample["hostname"] in self._nodes:
+                node = sample["hostname"]
+            else:
+                node = self._addresses.get(address)
+            if node is None:
+                return False
+            # Drop stale reports first: once a node's last report is stale,
+            # its timestamp no longer orders new ones, so an agent whose
+            # clock stepped back (NTP, restart) is accepted again.
+            for stale in [n for n, s in self._samples.items() if now - s["received"] > self.stale_after]:
+                del self._samples[stale]
+            previous = self._samples.get(node)
+            if self.key is not None and abs(now - sample["timestamp"]) > self.max_skew:
+                return False
+            if previous is not None and sample["timestamp"] <= previous["timestamp"]:
+                return False
+            sample["address"] = address
+            sample["received"] = now
+            self._samples[node] = sample
+            return True
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+
+    def latest(self, node: str) -> dict | None:
+        """Freshest sample for a hostfile node, or None."""
+        with self._lock:
+            sample = self._samples.get(node)
+        if sample is None or time.time() - sample["received"] > self.stale_after:
+            return None
+        return sample
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Send this node's resource usage to the cluster monitor")
+    parser.add_argument("--master", required=True, help="address of the node running monitor_cluster.py")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MONITOR_AGENT_PORT", DEFAULT_PORT)))
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between samples")
+    parser.add_argument("--key", default=os.environ.get("MONITOR_AGENT_KEY"),
+                        help="shared secret for signed frames (default $MONITOR_AGENT_KEY); "
+                             "the monitor ignores unsigned frames unless MONITOR_AGENT_UNSIGNED=1")
+    parser.add_argument("--hostname", default=socket.gethostname())
+    parser.add_argument("--count", type=int, default=0, help="stop after this many frames (0: run forever)")
+    args = parser.parse_args(argv)
+
+    key = args.key.encode() if args.key else None
+    sampler = ResourceSampler()
+    target = (args.master, args.port)
+    sent = 0
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        while not args.count or sent < args.count:
+            time.sleep(args.interval)
+            try:
+                sock.sendto(encode_frame(args.hostname, sampler.sample(), key), target)
+            except OSError as e:
+                print(f"node_agent: send to {args.master}:{args.port} failed: {e}")
+            sent += 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
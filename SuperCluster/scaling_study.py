@@ -0,0 +1,252 @@
+# scaling_study.py
+"""Strong and weak scaling study for the Monte Carlo Pi benchmark.
+
+One mpirun measures every rank count up to the job size: the job is
+split into sub-communicators of 1, 2, 4, ... ranks (`--ranks` to
+choose) and each runs `--warmup` untimed and `--repeats` timed trials
+of PiBenchmark. Ranks outside the current sub-communicator sleep-poll
+a non-blocking barrier so they do not steal cycles from the measured
+ones.
+
+    mpirun --hostfile hostfile -np 8 python scaling_study.py --mode strong --points 1e9
+    mpirun --hostfile hostfile -np 8 python scaling_study.py --mode weak --points 1e8
+
+--points is the total for strong scaling (fixed problem size) and the
+per-rank share for weak scaling (fixed work per rank). Trials are
+appended to `--report` (default scaling_report.json), so runs on
+different hostfiles, days or job sizes merge into one report; trials
+of the same mode, problem size and rank count are pooled. Re-print a
+report without running anything with `python scaling_study.py --summarize`.
+
+For every rank count p, against the smallest measured count b:
+
+    strong  speedup S = b * T_b / T_p,  efficiency E = S / p
+    weak    efficiency E = T_b / T_p,   scaled speedup S = p * E
+    Karp-Flatt serial fraction e = (1/S - 1/p) / (1 - 1/p)
+
+Mean times carry Student-t confidence intervals; the derived metrics
+carry percentile bootstrap intervals over the trials.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from mpi4py import MPI
+
+from bench_history import DEFAULT_HISTORY, measurement, record_run
+from bench_stats import bootstrap_ci, mean_ci
+from benchmark_pi import PiBenchmark
+
+
+def default_ranks(size: int) -> list[int]:
+    """Powers of two below the job size, plus the job size itself."""
+    ranks, p = [], 1
+    while p < size:
+        ranks.append(p)
+        p *= 2
+    return ranks + [size]
+
+
+def _idle_barrier(comm, poll: float = 0.01) -> None:
+    request = comm.Ibarrier()
+    while not request.Test():
+        time.sleep(poll)
+
+
+def run_trials(comm, ranks: int, points: int, repeats: int, warmup: int,
+               seed: int, block_size: int) -> list[float] | None:
+    """Collective over comm: time PiBenchmark on its first `ranks` ranks.
+
+    Returns the per-trial wall times (slowest rank) on rank 0, None elsewhere.
+    """
+    active = comm.Get_rank() < ranks
+    sub = comm.Split(0 if active else MPI.UNDEFINED, comm.Get_rank())
+    times = None
+    if active:
+        bench = PiBenchmark(block_size=block_size, seed=seed, comm=sub)
+        times = []
+        for trial in range(warmup + repeats):
+            sub.Barrier()
+            started = MPI.Wtime()
+            bench.calculate_pi_monte_carlo(points, run=trial)
+            elapsed = sub.allreduce(MPI.Wtime() - started, op=MPI.MAX)
+            if trial >= warmup:
+                times.append(elapsed)
+        sub.Free()
+    _idle_barrier(comm)
+    return times if comm.Get_rank() == 0 else None
+
+
+def _stats(mode: str, base: int, p: int, t_base, t_p):
+    """(speedup, efficiency, Karp-Flatt) from mean times; works on NumPy arrays too."""
+    if mode == "strong":
+        speedup = base * t_base / t_p
+        efficiency = speedup / p
+    else:
+        efficiency = t_base / t_p
+        speedup = p * efficiency
+    serial = (1 / speedup - 1 / p) / (1 - 1 / p) if p > 1 else None
+    return speedup, efficiency, serial
+
+
+def summarize(trials: list[dict], confidence: float = 0.95) -> list[dict]:
+    """Pool trial records by (mode, points, block size, ranks) and derive scaling metrics."""
+    studies = defaultdict(lambda: defaultdict(list))
+    for trial in trials:
+        key = (trial["mode"], trial["points"], trial["block_size"])
+        studies[key][trial["ranks"]].extend(trial["times"])
+
+    summaries = []
+    for (mode, points, block_size), by_ranks in sorted(studies.items()):
+        base = min(by_ranks)
+        t_base = by_ranks[base]
+        rows = []
+        for p in sorted(by_ranks):
+            times = by_ranks[p]
+            mean, low, high = mean_ci(times, confidence)
+            speedup, efficiency, serial = _stats(mode, base, p, sum(t_base) / len(t_base), mean)
+            row = {
+                "ranks": p,
+                "trials": len(times),
+                "time_mean": mean,
+                "time_ci": [low, high],
+                "speedup": speedup,
+                "efficiency": efficiency,
+                "karp_flatt": serial,
+            }
+            if p != base:
+                for i, name in enumerate(("speedup", "efficiency", "karp_flatt")):
+                    row[name + "_ci"] = list(bootstrap_ci(
+                        lambda tb, tp, i=i: _stats(mode, base, p, tb, tp)[i],
+                        [t_base, times], confidence))
+            rows.append(row)
+        summaries.append({
+            "mode": mode,
+            "points": points,
+            "block_size": block_size,
+            "baseline_ranks": base,
+            "confidence": confidence,
+            "rows": rows,
+        })
+    return summaries
+
+
+def load_report(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"trials": [], "studies": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(path: str, report: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _fmt_ci(row: dict, name: str, spec: str) -> str:
+    value = row[name]
+    if value is None:
+        return "-"
+    ci = row.get(name + "_ci")
+    if ci is None:
+        return format(value, spec)
+    return f"{value:{spec}} [{ci[0]:{spec}}, {ci[1]:{spec}}]"
+
+
+def print_report(studies: list[dict]) -> None:
+    for study in studies:
+        unit = "total" if study["mode"] == "strong" else "per rank"
+        print(f"=== {study['mode']} scaling: {study['points']:.3g} points {unit}, "
+              f"baseline {study['baseline_ranks']} rank(s), "
+              f"{study['confidence']:.0%} intervals ===")
+        print(f"{'ranks':>5} {'n':>3} {'time s':>28} {'speedup':>24} "
+              f"{'efficiency':>24} {'serial fraction':>27}")
+        for row in study["rows"]:
+            time_ci = f"{row['time_mean']:.4f} [{row['time_ci'][0]:.4f}, {row['time_ci'][1]:.4f}]"
+            print(f"{row['ranks']:>5} {row['trials']:>3} {time_ci:>28} "
+                  f"{_fmt_ci(row, 'speedup', '.2f'):>24} "
+                  f"{_fmt_ci(row, 'efficiency', '.1%'):>24} "
+                  f"{_fmt_ci(row, 'karp_flatt', '.4f'):>27}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Strong/weak scaling study for benchmark_pi.py")
+    parser.add_argument("--mode", choices=("strong", "weak"), default="strong")
+    parser.add_argument("--points", type=float, default=1e8,
+                        help="total points (strong) or points per rank (weak)")
+    parser.add_argument("--ranks", default=None,
+                        help="comma-separated rank counts (default 1, 2, 4, ... job size)")
+    parser.add_argument("--repeats", type=int, default=5, help="timed trials per rank count")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed trials first")
+    parser.add_argument("--block-size", type=int, default=2**20)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--report", default="scaling_report.json",
+                        help="JSON report to merge into (created if missing)")
+    parser.add_argument("--summarize", action="store_true",
+                        help="only recompute and print --report")
+    parser.add_argument("--history", default=DEFAULT_HISTORY,
+                        help="append this run's trial times to the benchmark history (empty to skip)")
+    parser.add_argument("--hostfile", default="hostfile",
+                        help="hostfile the job was started with, hashed into the history entry")
+    args = parser.parse_args(argv)
+
+    comm = MPI.COMM_WORLD
+    if args.summarize:
+        if comm.Get_rank() == 0:
+            report = load_report(args.report)
+            report["studies"] = summarize(report["trials"], args.confidence)
+            save_report(args.report, report)
+            print_report(report["studies"])
+        return 0
+
+    size = comm.Get_size()
+    ranks = sorted({int(r) for r in args.ranks.split(",")}) if args.ranks else default_ranks(size)
+    if ranks[0] < 1 or ranks[-1] > size:
+        parser.error(f"--ranks must lie between 1 and the job size ({size})")
+    # Same root seed for every rank count so trials differ only in layout.
+    seed = PiBenchmark(seed=args.seed).seed
+    points = int(args.points)
+
+    trials = []
+    for p in ranks:
+        total = points if args.mode == "strong" else points * p
+        times = run_trials(comm, p, total, args.repeats, args.warmup, seed, args.block_size)
+        if comm.Get_rank() == 0:
+            print(f"{args.mode}: {p} rank(s), {total} points: "
+                  + ", ".join(f"{t:.4f}s" for t in times))
+            trials.append({
+                "mode": args.mode,
+                "points": points,
+                "ranks": p,
+                "times": times,
+                "warmup": args.warmup,
+                "block_size": args.block_size,
+                "seed": seed,
+                "job_size": size,
+                "processor": MPI.Get_processor_name(),
+                "timestamp": time.time(),
+            })
+
+    if comm.Get_rank() == 0:
+        report = load_report(args.report)
+        report["trials"].extend(trials)
+        report["studies"] = summarize(report["trials"], args.confidence)
+        save_report(args.report, report)
+        print_report(report["studies"])
+        if args.history:
+            record_run(args.history, f"scaling_{args.mode}",
+                       [measurement(f"points={points} ranks={t['ranks']}", "seconds", t["times"],
+                                    higher_is_better=False) for t in trials],
+                       size, args.hostfile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
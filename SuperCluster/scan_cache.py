@@ -0,0 +1,104 @@
+# scan_cache.py
+"""Persistent per-host result cache for security_scanner.py.
+
+Records are keyed by (ip, profile), where the profile names the engine
+and its arguments, so a `-sV -O` result is never served for a connect
+sweep or vice versa. Entries older than the TTL are stale and get
+rescanned; once the cache holds more than `max_entries` rows the least
+recently used ones are evicted.
+
+Only rank 0 opens the cache (SQLite does not belong on shared NFS), so
+workers never see it: the master answers fresh hosts itself and only
+dispatches the rest.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    ip TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (ip, profile)
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+"""
+
+# SQLite caps host parameters per statement; stay well below it.
+_MAX_PARAMS = 500
+
+
+class ScanCache:
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 1_000_000,
+                 flush_every: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._unflushed = 0
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def get_many(self, ips: list[str], profile: str) -> dict[str, dict]:
+        """Fresh cached records for ips, keyed by ip. Touches their LRU stamp."""
+        now = time.time()
+        fresh: dict[str, dict] = {}
+        for start in range(0, len(ips), _MAX_PARAMS):
+            chunk = ips[start:start + _MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            rows = self._db.execute(
+                f"SELECT ip, record FROM results WHERE profile = ? AND scanned_at >= ? "
+                f"AND ip IN ({marks})",
+                (profile, now - self.ttl, *chunk),
+            ).fetchall()
+            fresh.update((ip, json.loads(record)) for ip, record in rows)
+        if fresh:
+            self._db.executemany(
+                "UPDATE results SET accessed_at = ? WHERE ip = ? AND profile = ?",
+                [(now, ip, profile) for ip in fresh],
+            )
+            self._count_write(len(fresh))
+        self.hits += len(fresh)
+        self.misses += len(ips) - len(fresh)
+        return fresh
+
+    def get(self, ip: str, profile: str) -> dict | None:
+        return self.get_many([ip], profile).get(ip)
+
+    def put(self, record: dict, profile: str) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (ip, profile, scanned_at, accessed_at, record) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (record["ip"], profile, now, now, json.dumps(record, separators=(",", ":"))),
+        )
+        self._count_write(1)
+
+    def _count_write(self, n: int) -> None:
+        # Committing per record would dominate a fast scan; batch instead.
+        self._unflushed += n
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit pending writes and evict least recently used rows over the cap."""
+        excess = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE rowid IN "
+                "(SELECT rowid FROM results ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+        self._db.commit()
+        self._unflushed = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
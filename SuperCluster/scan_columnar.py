@@ -0,0 +1,259 @@
+# scan_columnar.py
+"""Compact columnar copy of scan results with a small query API.
+
+NDJSON is the right format while a scan runs (append-only, crash-safe)
+but a poor one to query: answering "who exposes 3389?" means parsing
+every record. This module turns a results file into one row per
+(host, port) stored as NumPy columns in a compressed .npz:
+
+    ip_hi, ip_lo   uint64   address as a 128-bit integer (IPv4 in ip_lo)
+    ip_version     uint8    4 or 6
+    status         uint8    code into STATUSES (up/down/error)
+    port           uint16   0 for a host row without ports
+    proto          uint8    code into PROTOCOLS
+    state          uint8    code into STATES
+    service, product, version
+                   uint32   codes into the matching *_values string column
+    timestamp      float64  POSIX seconds of the scan
+
+Rows are sorted by address, with the last record per host kept (a
+resumed scan may have repeated a batch). Columns are stored
+separately and only decompressed when a query touches them, so a port
+lookup reads `port`, `state` and the address columns and nothing else.
+
+Usage:
+    python scan_columnar.py convert scan_results.ndjson scan_results.npz
+    python scan_columnar.py query scan_results.npz --port 22
+    python scan_columnar.py query scan_results.npz --service http --product nginx
+"""
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import os
+import sys
+import tempfile
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from scan_results import read_ndjson
+from scan_store import sort_ndjson
+
+STATUSES = ("up", "down", "error")
+PROTOCOLS = ("", "tcp")
+STATES = ("", "open", "closed", "filtered", "open|filtered", "closed|filtered", "unfiltered")
+DICTIONARY_FIELDS = ("service", "product", "version")
+_RECORD_FIELDS = {"service": "name", "product": "product", "version": "version"}
+
+
+def _timestamp(value: str | None) -> float:
+    if not value:
+        return float("nan")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return float("nan")
+
+
+class _Dictionary:
+    """String -> dense code, with "" always code 0."""
+
+    def __init__(self):
+        self.codes = {"": 0}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+    def values(self) -> np.ndarray:
+        return np.array(list(self.codes), dtype=str)
+
+
+class ColumnarWriter:
+    """Accumulates records as compact typed arrays; writes the .npz on close.
+
+    Same write/close/count interface as NDJSONResultWriter. Rows are
+    stored in arrival order; use convert_ndjson for sorted, deduplicated
+    output.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._cols = {
+            "ip_hi": array("Q"), "ip_lo": array("Q"), "ip_version": array("B"),
+            "status": array("B"), "port": array("H"), "proto": array("B"),
+            "state": array("B"), "service": array("I"), "product": array("I"),
+            "version": array("I"), "timestamp": array("d"),
+        }
+        self._dicts = {name: _Dictionary() for name in DICTIONARY_FIELDS}
+
+    def _row(self, addr, status, stamp, port=0, proto="", info=None):
+        info = info or {}
+        value = int(addr)
+        cols = self._cols
+        cols["ip_hi"].append(value >> 64)
+        cols["ip_lo"].append(value & 0xFFFFFFFFFFFFFFFF)
+        cols["ip_version"].append(addr.version)
+        cols["status"].append(status)
+        cols["port"].append(port)
+        cols["proto"].append(PROTOCOLS.index(proto))
+        state = info.get("state", "")
+        cols["state"].append(STATES.index(state) if state in STATES else 0)
+        for name in DICTIONARY_FIELDS:
+            cols[name].append(self._dicts[name].code(info.get(_RECORD_FIELDS[name], "") or ""))
+        cols["timestamp"].append(stamp)
+
+    def write(self, record: dict) -> None:
+        addr = ipaddress.ip_address(record["ip"])
+        status = STATUSES.index(record.get("status", "error"))
+        stamp = _timestamp(record.get("timestamp"))
+        ports = record.get("ports") or {}
+        if not ports:
+            self._row(addr, status, stamp)
+        for port, info in sorted(ports.items(), key=lambda item: int(item[0])):
+            self._row(addr, status, stamp, int(port), "tcp", info)
+        self.count += 1
+
+    def close(self) -> None:
+        columns = {name: np.frombuffer(col, dtype=col.typecode) if len(col)
+                   else np.array([], dtype=col.typecode)
+                   for name, col in self._cols.items()}
+        for name, values in self._dicts.items():
+            columns[f"{name}_values"] = values.values()
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(tmp, **columns)
+        os.replace(tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def convert_ndjson(src: str, dst: str) -> int:
+    """Sort and deduplicate an NDJSON results file into a columnar .npz; returns hosts."""
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(dst))) as tmp:
+        ordered = os.path.join(tmp, "sorted.ndjson")
+        sort_ndjson(src, ordered)
+        with ColumnarWriter(dst) as writer:
+            for record in read_ndjson(ordered):
+                writer.write(record)
+    return writer.count
+
+
+def write_columnar(records, dst: str) -> int:
+    """Write an in-memory list of records (e.g. a static scan) as columnar .npz."""
+    with ColumnarWriter(dst) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+class ColumnarResults:
+    """Read side: columns are loaded on first use and cached."""
+
+    def __init__(self, path: str):
+        self._npz = np.load(path, allow_pickle=False)
+        self._cache: dict[str, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._cache:
+            self._cache[name] = self._npz[name]
+        return self._cache[name]
+
+    def close(self) -> None:
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.column("port"))
+
+    def _code(self, field: str, value: str) -> int | None:
+        matches = np.flatnonzero(self.column(f"{field}_values") == value)
+        return int(matches[0]) if len(matches) else None
+
+    def _ips(self, mask: np.ndarray) -> list[str]:
+        hi, lo = self.column("ip_hi")[mask], self.column("ip_lo")[mask]
+        version = self.column("ip_version")[mask]
+        return [str(ipaddress.IPv6Address((int(h) << 64) | int(l)) if v == 6
+                    else ipaddress.IPv4Address(int(l)))
+                for h, l, v in zip(hi, lo, version)]
+
+    def match(self, port: int | None = None, state: str | None = "open",
+              service: str | None = None, product: str | None = None,
+              version: str | None = None) -> np.ndarray:
+        """Boolean row mask for every given condition (None means any)."""
+        mask = np.ones(len(self), dtype=bool)
+        if port is not None:
+            mask &= self.column("port") == port
+        if state is not None:
+            mask &= self.column("state") == STATES.index(state)
+        for field, value in (("service", service), ("product", product), ("version", version)):
+            if value is None:
+                continue
+            code = self._code(field, value)
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.column(field) == code
+        return mask
+
+    def hosts_with_port(self, port: int, state: str = "open") -> list[str]:
+        """Addresses with `port` in `state`, in address order."""
+        return self._ips(self.match(port=port, state=state))
+
+    def select(self, mask: np.ndarray) -> list[tuple[str, int]]:
+        """(address, port) for every row in mask."""
+        return list(zip(self._ips(mask), (int(p) for p in self.column("port")[mask])))
+
+    def hosts_with_service(self, service: str | None = None, product: str | None = None,
+                           version: str | None = None) -> list[tuple[str, int]]:
+        """(address, port) pairs whose open port matches the service fields."""
+        return self.select(self.match(service=service, product=product, version=version))
+
+    def hosts(self, status: str = "up") -> list[str]:
+        """Distinct addresses with the given host status."""
+        mask = self.column("status") == STATUSES.index(status)
+        key = self.column("ip_hi")[mask], self.column("ip_lo")[mask]
+        first = np.ones(mask.sum(), dtype=bool)
+        first[1:] = (key[0][1:] != key[0][:-1]) | (key[1][1:] != key[1][:-1])
+        return self._ips(np.flatnonzero(mask)[first])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Columnar scan results")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="NDJSON results -> columnar .npz")
+    convert.add_argument("results")
+    convert.add_argument("output")
+    query = sub.add_parser("query", help="print hosts matching port/service conditions")
+    query.add_argument("table")
+    query.add_argument("--port", type=int)
+    query.add_argument("--state", default="open", choices=[s for s in STATES if s])
+    query.add_argument("--service")
+    query.add_argument("--product")
+    query.add_argument("--version")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        print(f"{convert_ndjson(args.results, args.output)} hosts written to {args.output}")
+        return 0
+    with ColumnarResults(args.table) as table:
+        mask = table.match(args.port, args.state, args.service, args.product, args.version)
+        for ip, port in table.select(mask):
+            sys.stdout.write(f"{ip}\t{port}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# scan_metrics.py
+"""Per-rank instrumentation for security_scanner.py.
+
+Each rank records where its time goes -- inside nmap, in the Python
+around it (process spawn, XML parsing, record building), waiting for
+work from rank 0 -- plus per-host latency and bytes received over MPI.
+Rank 0 merges every rank's counters into one JSON summary with
+throughput, latency percentiles and load imbalance, which is enough to
+tell a network-bound scan (time is in nmap) from a scheduler-bound one
+(workers sit waiting for rank 0).
+
+Latencies go into a fixed log-bucket histogram so the summary costs the
+same whether the scan covered a /24 or a /8.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+# 20 buckets per decade from 1 ms to ~28 h: about 12% bucket width.
+_BUCKETS_PER_DECADE = 20
+_MIN_SECONDS = 1e-3
+_NUM_BUCKETS = 5 * _BUCKETS_PER_DECADE + 1
+
+
+class LatencyHistogram:
+    def __init__(self, counts: list[int] | None = None):
+        self.counts = counts or [0] * _NUM_BUCKETS
+
+    def add(self, seconds: float, n: int = 1) -> None:
+        if seconds <= _MIN_SECONDS:
+            index = 0
+        else:
+            index = int(math.log10(seconds / _MIN_SECONDS) * _BUCKETS_PER_DECADE) + 1
+        self.counts[min(index, _NUM_BUCKETS - 1)] += n
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        return _MIN_SECONDS * 10 ** (index / _BUCKETS_PER_DECADE)
+
+    def percentile(self, q: float) -> float | None:
+        """Upper edge of the bucket holding the q-th percentile (0-100)."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank = math.ceil(total * q / 100)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self._upper_bound(index)
+        return self._upper_bound(_NUM_BUCKETS - 1)
+
+
+class RankMetrics:
+    """Counters for one rank. Thread-safe: scan threads update it concurrently."""
+
+    def __init__(self, rank: int):
+        self.rank = rank
+        self.hosts = 0
+        self.units = 0
+        self.nmap_seconds = 0.0
+        self.python_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.bytes_received = 0
+        self.messages_received = 0
+        self.latency = LatencyHistogram()
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_scan(self, hosts: int, wall: float, nmap_elapsed: float = 0.0) -> None:
+        """One engine run over `hosts` hosts. Every host in it waited `wall` seconds."""
+        nmap_elapsed = min(nmap_elapsed, wall)
+        with self._lock:
+            self.hosts += hosts
+            self.nmap_seconds += nmap_elapsed
+            self.python_seconds += wall - nmap_elapsed
+            self.latency.add(wall, hosts)
+
+    def record_unit(self) -> None:
+        with self._lock:
+            self.units += 1
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.queue_wait_seconds += seconds
+
+    def record_recv(self, status) -> None:
+        """Account for one received message, given its MPI.Status."""
+        with self._lock:
+            self.bytes_received += status.Get_count()
+            self.messages_received += 1
+
+    def finish(self) -> None:
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "rank": self.rank,
+            "hosts": self.hosts,
+            "units": self.units,
+            "wall_seconds": self.wall_seconds,
+            "nmap_seconds": self.nmap_seconds,
+            "python_seconds": self.python_seconds,
+            "queue_wait_seconds": self.queue_wait_seconds,
+            "bytes_received": self.bytes_received,
+            "messages_received": self.messages_received,
+            "latency_histogram": self.latency.counts,
+        }
+
+
+def _imbalance(values: list[float]) -> float:
+    """max/mean - 1: 0.0 is perfectly balanced, 1.0 means the busiest did twice the mean."""
+    mean = sum(values) / len(values) if values else 0.0
+    return max(values) / mean - 1 if mean > 0 else 0.0
+
+
+def summarize(ranks: list[dict], wall_seconds: float) -> dict:
+    """Reduce per-rank dicts (RankMetrics.to_dict) into one cluster summary."""
+    latency = LatencyHistogram()
+    for r in ranks:
+        latency.merge(LatencyHistogram(r["latency_histogram"]))
+    hosts = sum(r["hosts"] for r in ranks)
+    scanners = [r for r in ranks if r["hosts"]] or ranks
+    engine = sum(r["nmap_seconds"] + r["python_seconds"] for r in scanners)
+    waiting = sum(r["queue_wait_seconds"] for r in scanners)
+    worker_wall = sum(r["wall_seconds"] for r in scanners)
+
+    queue_wait_fraction = waiting / worker_wall if worker_wall else 0.0
+    nmap_fraction = sum(r["nmap_seconds"] for r in scanners) / engine if engine else 0.0
+    if queue_wait_fraction > 0.2:
+        bound = "scheduler"  # workers idle, waiting on rank 0
+    elif nmap_fraction >= 0.5:
+        bound = "network"  # time goes into nmap probing targets
+    else:
+        bound = "python"  # spawn/parse overhead dominates
+
+    return {
+        "wall_seconds": wall_seconds,
+        "hosts": hosts,
+        "hosts_per_second": hosts / wall_seconds if wall_seconds > 0 else 0.0,
+        "latency_seconds": {
+            "p50": latency.percentile(50),
+            "p95": latency.percentile(95),
+            "p99": latency.percentile(99),
+        },
+        "nmap_fraction": nmap_fraction,
+        "queue_wait_fraction": queue_wait_fraction,
+        "likely_bound": bound,
+        "load_imbalance": {
+            "hosts": _imbalance([r["hosts"] for r in scanners]),
+            "busy_seconds": _imbalance([r["nmap_seconds"] + r["python_seconds"] for r in scanners]),
+        },
+        "bytes_received": sum(r["bytes_received"] for r in ranks),
+        "ranks": [{k: v for k, v in r.items() if k != "latency_histogram"} for r in ranks],
+    }
@@ -0,0 +1,153 @@
+# scan_rate.py
+"""Cluster-wide adaptive rate control for security_scanner.py.
+
+Workers report, with every finished work unit, how many probes it sent
+and how many of them went unanswered. Rank 0 feeds those reports into a
+RateController, which runs AIMD (additive increase, multiplicative
+decrease, as in TCP congestion control) on two knobs:
+
+* a cluster-wide packets-per-second budget, split evenly across the
+  worker slots and attached to every unit it hands out (nmap
+  `--max-rate`, or the connect engine's global pacer);
+* a concurrency cap per target subnet: how many units may probe the
+  same /24 at once, so one firewall or thin uplink that starts dropping
+  is backed off without slowing every other subnet down.
+
+Loss is the fraction of probes to responsive hosts that timed out;
+probes to addresses nobody answers on say nothing about congestion and
+are left out. The connect engine counts every connect() that hit its
+timeout. nmap does not report retransmits through python-nmap, so for
+nmap the proxy is the share of listed ports on up hosts answering
+'no-response'; nmap's own per-host timing still adapts underneath the
+cap.
+"""
+from __future__ import annotations
+
+import ipaddress
+import time
+from collections import Counter
+
+
+def subnet_of(ip: str, prefix: int = 24) -> str:
+    """The /prefix network containing ip (IPv6 addresses use their /64)."""
+    addr = ipaddress.ip_address(ip)
+    bits = prefix if addr.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{bits}", strict=False))
+
+
+def loss_ratio(stats: Counter | None) -> float | None:
+    """Timed-out share of a unit's probes, or None if it sent none."""
+    if not stats or not stats["probes"]:
+        return None
+    return min(1.0, stats["timeouts"] / stats["probes"])
+
+
+def nmap_probe_stats(scanned: dict, stats: Counter) -> None:
+    """Add the nmap loss proxy for one run (python-nmap's 'scan' dict) to stats."""
+    for host in scanned.values():
+        ports = host.get("tcp", {})
+        stats["probes"] += 1 + len(ports)
+        stats["timeouts"] += sum(1 for p in ports.values() if p.get("reason") == "no-response")
+
+
+class _Aimd:
+    """One AIMD-controlled value with a cool-down between decreases.
+
+    Losses reported by units that were already in flight when the last
+    decrease happened describe the old rate, so only one decrease is
+    applied per `cooldown` seconds.
+    """
+
+    def __init__(self, value: float, floor: float, ceiling: float, step: float,
+                 factor: float, cooldown: float):
+        self.value = value
+        self.floor = floor
+        self.ceiling = ceiling
+        self.step = step
+        self.factor = factor
+        self.cooldown = cooldown
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+
+    def update(self, congested: bool, now: float) -> None:
+        if not congested:
+            self.value = min(self.ceiling, self.value + self.step)
+        elif now - self._last_decrease >= self.cooldown:
+            self.value = max(self.floor, self.value * self.factor)
+            self.decreases += 1
+            self._last_decrease = now
+
+
+class RateController:
+    """Rank 0's view of how hard the cluster may push the targets.
+
+    max_rate     -- packets/s ceiling for the whole cluster (the budget
+                    starts here and never exceeds it)
+    min_rate     -- floor the budget never drops below
+    slots        -- work units in flight cluster-wide; each gets an
+                    equal share of the budget
+    subnet_cap   -- units allowed on one subnet at once (start and ceiling)
+    loss_threshold -- loss ratio above which a unit counts as congested
+    """
+
+    def __init__(self, max_rate: float, slots: int, min_rate: float = 10.0,
+                 subnet_cap: int = 4, prefix: int = 24, loss_threshold: float = 0.05,
+                 backoff: float = 0.5, cooldown: float = 2.0):
+        self.slots = max(1, slots)
+        self.prefix = prefix
+        self.loss_threshold = loss_threshold
+        self._budget = _Aimd(max_rate, min(min_rate, max_rate), max_rate,
+                             step=max_rate / 20, factor=backoff, cooldown=cooldown)
+        self._cap_args = dict(floor=1, ceiling=subnet_cap, step=1, factor=backoff,
+                              cooldown=cooldown)
+        self._caps: dict[str, _Aimd] = {}
+        self._inflight: Counter = Counter()
+
+    @property
+    def budget(self) -> float:
+        return self._budget.value
+
+    def unit_rate(self) -> float:
+        """Packets/s one unit may use under the current budget."""
+        return max(1.0, self.budget / self.slots)
+
+    def _cap(self, subnet: str) -> _Aimd:
+        cap = self._caps.get(subnet)
+        if cap is None:
+            cap = self._caps[subnet] = _Aimd(self._cap_args["ceiling"], **self._cap_args)
+        return cap
+
+    def has_room(self, subnet: str) -> bool:
+        return self._inflight[subnet] < int(self._cap(subnet).value)
+
+    def started(self, subnet: str) -> None:
+        self._inflight[subnet] += 1
+
+    def finished(self, subnet: str, stats: Counter | None) -> None:
+        """A unit on subnet is done; fold its probe stats into both knobs."""
+        self._inflight[subnet] -= 1
+        if self._inflight[subnet] <= 0:
+            del self._inflight[subnet]
+        loss = loss_ratio(stats)
+        if loss is None:
+            return
+        congested = loss > self.loss_threshold
+        now = time.monotonic()
+        self._budget.update(congested, now)
+        cap = self._cap(subnet)
+        cap.update(congested, now)
+        if cap.value >= cap.ceiling and subnet not in self._inflight:
+            # Back at full speed and idle: forget it, so a /8 sweep does
+            # not keep 65536 entries around.
+            del self._caps[subnet]
+
+    def snapshot(self) -> dict:
+        return {
+            "budget_pps": self.budget,
+            "budget_decreases": self._budget.decreases,
+            "unit_rate_pps": self.unit_rate(),
+            "throttled_subnets": {
+                subnet: int(cap.value) for subnet, cap in sorted(self._caps.items())
+                if cap.value < cap.ceiling
+            },
+        }
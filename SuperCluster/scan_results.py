@@ -0,0 +1,122 @@
+# scan_results.py
+"""Incremental result output for security_scanner.py.
+
+Rank 0 streams per-host records into an append-only NDJSON file (one
+JSON object per line) as workers report them, so memory on the master
+stays bounded and a crash only loses the hosts still in flight. The
+checkpoint records which work batches are fully on disk so an
+interrupted scan can resume where it stopped.
+"""
+from __future__ import annotations
+
+import json
+import os
+
+
+class NDJSONResultWriter:
+    """NDJSON sink. Each record is flushed as it is written.
+
+    A new scan truncates the file; append=True continues one that a
+    resumed checkpoint already wrote part of.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.count = 0
+        self._fh = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        self._fh.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._fh.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_ndjson(path: str):
+    """Yield records from an NDJSON results file, skipping a torn last line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves at most one partial line.
+                continue
+
+
+class ScanCheckpoint:
+    """Completed-batch ledger for resuming an interrupted scan.
+
+    Batches are numbered in dispatch order, so completions arrive almost
+    in order. The ledger keeps a low-water mark (every id below it is
+    done) plus the few completed ids above it, which keeps both memory
+    and the on-disk file proportional to the number of in-flight
+    batches rather than to the size of the range.
+
+    Batches that were partly streamed when the scan died are scanned
+    again on resume, so their hosts can appear twice in the NDJSON file;
+    consumers should treat the last record per ip as authoritative.
+    """
+
+    def __init__(self, path: str, target: str, batch_size: int, seed: int | None = None):
+        self.path = path
+        self.target = target
+        self.batch_size = batch_size
+        self.seed = seed
+        self.low_water = 0
+        self.done: set[int] = set()
+        # True when continuing an earlier scan's ledger.
+        self.resumed = os.path.exists(path)
+        if self.resumed:
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state["target"] != self.target or state["batch_size"] != self.batch_size:
+            raise ValueError(
+                f"checkpoint {self.path} belongs to {state['target']} "
+                f"(batch size {state['batch_size']}), not {self.target} "
+                f"(batch size {self.batch_size})"
+            )
+        self.low_water = state["low_water"]
+        self.done = set(state["done"])
+
+    @staticmethod
+    def stored_seed(path: str) -> int | None:
+        """Shuffle seed saved in an existing checkpoint file, if any."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("seed")
+
+    def is_done(self, batch_id: int) -> bool:
+        return batch_id < self.low_water or batch_id in self.done
+
+    def mark_done(self, batch_id: int) -> None:
+        self.done.add(batch_id)
+        while self.low_water in self.done:
+            self.done.remove(self.low_water)
+            self.low_water += 1
+        self.save()
+
+    def save(self) -> None:
+        state = {
+            "target": self.target,
+            "batch_size": self.batch_size,
+            "seed": self.seed,
+            "low_water": self.low_water,
+            "done": sorted(self.done),
+        }
+        # Write-then-rename so a crash never leaves a truncated checkpoint.
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
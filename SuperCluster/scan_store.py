@@ -0,0 +1,226 @@
+# scan_store.py
+"""History of scan runs and a streaming diff between any two of them.
+
+Each run is kept as an NDJSON file sorted by address with one record
+per host (the last record wins, so resumed scans that repeated a batch
+collapse cleanly). Sorting uses a bounded-memory external merge sort,
+and diffing is a merge-join over two sorted files, so neither step ever
+holds a whole /16 run in memory.
+
+Usage:
+    python scan_store.py add scan_results.ndjson      # store a finished scan
+    python scan_store.py list
+    python scan_store.py diff [OLD_RUN [NEW_RUN]]     # default: last two runs / OLD vs latest
+
+Diff events are printed as NDJSON, one per line:
+    {"event": "host_new", "ip": ...}
+    {"event": "host_gone", "ip": ...}
+    {"event": "port_opened", "ip": ..., "port": ..., "service": {...}}
+    {"event": "port_closed", "ip": ..., "port": ..., "service": {...}}
+    {"event": "service_changed", "ip": ..., "port": ..., "old": {...}, "new": {...}}
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import ipaddress
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Iterator
+
+SERVICE_FIELDS = ("name", "product", "version")
+
+
+def _ip_key(ip: str) -> tuple[int, int]:
+    addr = ipaddress.ip_address(ip)
+    return addr.version, int(addr)
+
+
+def _keyed_lines(path: str) -> Iterator[tuple[tuple[int, int], int, str]]:
+    """(address key, line number, line) for every parseable record."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            yield _ip_key(record["ip"]), lineno, line if line.endswith("\n") else line + "\n"
+
+
+def sort_ndjson(src: str, dst: str, chunk_lines: int = 100_000) -> int:
+    """External sort of src by address into dst, keeping the last record per host.
+
+    Returns the number of hosts written. Memory is bounded by chunk_lines.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(dst))) as tmp:
+        runs = []
+        chunk: list[tuple[tuple[int, int], int, str]] = []
+
+        def spill():
+            chunk.sort()
+            path = os.path.join(tmp, f"run{len(runs)}")
+            with open(path, "w", encoding="utf-8") as f:
+                for key, lineno, line in chunk:
+                    f.write(f"{key[0]} {key[1]} {lineno}\t{line}")
+            runs.append(path)
+            chunk.clear()
+
+        for item in _keyed_lines(src):
+            chunk.append(item)
+            if len(chunk) >= chunk_lines:
+                spill()
+        if chunk or not runs:
+            spill()
+
+        def read_run(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for row in f:
+                    head, line = row.split("\t", 1)
+                    version, value, lineno = (int(x) for x in head.split())
+                    yield (version, value), lineno, line
+
+        files = [read_run(p) for p in runs]
+        written = 0
+        with open(dst, "w", encoding="utf-8") as out:
+            pending = None
+            for key, _, line in heapq.merge(*files):
+                # Equal keys arrive in line order; keep only the last.
+                if pending is not None and pending[0] != key:
+                    out.write(pending[1])
+                    written += 1
+                pending = (key, line)
+            if pending is not None:
+                out.write(pending[1])
+                written += 1
+    return written
+
+
+def _sorted_records(path: str) -> Iterator[tuple[tuple[int, int], dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield _ip_key(record["ip"]), record
+
+
+def _open_ports(record: dict) -> dict[str, dict]:
+    return {
+        str(port): {field: info.get(field, "") for field in SERVICE_FIELDS}
+        for port, info in record.get("ports", {}).items()
+        if info.get("state") == "open"
+    }
+
+
+def _diff_host(ip: str, old: dict, new: dict) -> Iterator[dict]:
+    old_ports, new_ports = _open_ports(old), _open_ports(new)
+    for port in sorted(old_ports.keys() | new_ports.keys(), key=int):
+        if port not in old_ports:
+            yield {"event": "port_opened", "ip": ip, "port": int(port), "service": new_ports[port]}
+        elif port not in new_ports:
+            yield {"event": "port_closed", "ip": ip, "port": int(port), "service": old_ports[port]}
+        elif old_ports[port] != new_ports[port]:
+            yield {"event": "service_changed", "ip": ip, "port": int(port),
+                   "old": old_ports[port], "new": new_ports[port]}
+
+
+def diff_runs(old_path: str, new_path: str) -> Iterator[dict]:
+    """Merge-join two sorted runs and yield change events in address order.
+
+    Only hosts with status 'up' count as present. A new host is followed
+    by port_opened events for its open ports; a gone host is reported
+    once, without per-port events. A host whose record is an error in
+    either run is skipped rather than reported as gone.
+    """
+    sentinel = (None, None)
+    old_iter, new_iter = _sorted_records(old_path), _sorted_records(new_path)
+    old_key, old = next(old_iter, sentinel)
+    new_key, new = next(new_iter, sentinel)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old_key < new_key):
+            if old["status"] == "up":
+                yield {"event": "host_gone", "ip": old["ip"]}
+            old_key, old = next(old_iter, sentinel)
+        elif old is None or new_key < old_key:
+            if new["status"] == "up":
+                yield {"event": "host_new", "ip": new["ip"]}
+                yield from _diff_host(new["ip"], {}, new)
+            new_key, new = next(new_iter, sentinel)
+        else:
+            if "error" not in (old["status"], new["status"]):
+                was_up, is_up = old["status"] == "up", new["status"] == "up"
+                if is_up and not was_up:
+                    yield {"event": "host_new", "ip": new["ip"]}
+                elif was_up and not is_up:
+                    yield {"event": "host_gone", "ip": old["ip"]}
+                if is_up:
+                    yield from _diff_host(new["ip"], old if was_up else {}, new)
+            old_key, old = next(old_iter, sentinel)
+            new_key, new = next(new_iter, sentinel)
+
+
+class ScanStore:
+    """Directory of sorted runs named by UTC timestamp (lexical == chronological)."""
+
+    def __init__(self, root: str = "scan_store"):
+        self.root = root
+        self.runs_dir = os.path.join(root, "runs")
+        os.makedirs(self.runs_dir, exist_ok=True)
+
+    def runs(self) -> list[str]:
+        return sorted(name[:-len(".ndjson")] for name in os.listdir(self.runs_dir)
+                      if name.endswith(".ndjson"))
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self.runs_dir, f"{run_id}.ndjson")
+
+    def add_run(self, results_path: str, run_id: str | None = None) -> str:
+        """Sort, dedupe and store a results file; returns the new run id."""
+        run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        tmp = self.path(run_id) + ".tmp"
+        sort_ndjson(results_path, tmp)
+        os.replace(tmp, self.path(run_id))
+        return run_id
+
+    def diff(self, old_run: str, new_run: str) -> Iterator[dict]:
+        return diff_runs(self.path(old_run), self.path(new_run))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Scan run history and diffs")
+    parser.add_argument("--store", default="scan_store", help="store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="store a finished NDJSON results file as a new run")
+    add.add_argument("results")
+    sub.add_parser("list", help="list stored runs, oldest first")
+    diff = sub.add_parser("diff", help="print change events between two runs")
+    diff.add_argument("old", nargs="?", help="default: the second-latest run")
+    diff.add_argument("new", nargs="?", help="default: the latest run")
+    args = parser.parse_args()
+
+    store = ScanStore(args.store)
+    if args.command == "add":
+        print(store.add_run(args.results))
+    elif args.command == "list":
+        for run_id in store.runs():
+            print(run_id)
+    else:
+        runs = store.runs()
+        if args.old is None:
+            if len(runs) < 2:
+                print("Need at least two stored runs to diff", file=sys.stderr)
+                return 1
+            args.old, args.new = runs[-2], runs[-1]
+        elif args.new is None:
+            if not runs:
+                print("No stored runs to diff against", file=sys.stderr)
+                return 1
+            args.new = runs[-1]
+        for event in store.diff(args.old, args.new):
+            sys.stdout.write(json.dumps(event) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# scan_targets.py
+"""Lazy, integer-based target ranges for security_scanner.py.
+
+A /8 has 16.7M hosts and an IPv6 /64 has 2**64, so the scanner never
+materialises an address list. A TargetRange maps a dense index space
+[0, count) onto the host addresses of a network; work is described by
+(start, end, stride) index descriptors that cost a few bytes to send no
+matter how many hosts they cover. Every rank builds the same
+TargetRange from the same arguments and expands its descriptors
+locally.
+"""
+from __future__ import annotations
+
+import bisect
+import ipaddress
+import math
+import random
+from typing import Iterable, Iterator
+
+
+def _host_bounds(net) -> tuple[int, int]:
+    """First and last usable host as integers, matching ip_network().hosts()."""
+    first = int(net.network_address)
+    last = int(net.broadcast_address)
+    if net.version == 4 and net.prefixlen <= 30:
+        return first + 1, last - 1  # drop network and broadcast
+    if net.version == 6 and net.prefixlen <= 126:
+        return first + 1, last  # drop the subnet-router anycast address
+    return first, last
+
+
+def _merge_intervals(intervals: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+class TargetRange:
+    """Host addresses of one network, minus exclusions, optionally shuffled.
+
+    Indices are permuted with an affine map i -> (a*i + c) mod n where
+    gcd(a, n) == 1, which visits every host exactly once in a seeded,
+    scattered order using O(1) memory. Excluded addresses keep their
+    index and are skipped on expansion, so descriptors stay valid.
+    """
+
+    def __init__(self, network: str, exclude: Iterable[str] = (), shuffle: bool = False,
+                 seed: int | None = None):
+        net = ipaddress.ip_network(network, strict=False)
+        self.network = net
+        self.version = net.version
+        self._addr_cls = ipaddress.IPv4Address if net.version == 4 else ipaddress.IPv6Address
+        self.first, last = _host_bounds(net)
+        # Size of the index space. Deliberately not __len__: an IPv6 /64
+        # overflows the int len() is allowed to return.
+        self.count = last - self.first + 1
+
+        self.exclude = tuple(exclude)
+        spans = []
+        for item in self.exclude:
+            ex = ipaddress.ip_network(item, strict=False)
+            if ex.version == net.version and ex.overlaps(net):
+                spans.append((int(ex.network_address), int(ex.broadcast_address)))
+        self._excluded = _merge_intervals(spans)
+        self._excluded_starts = [lo for lo, _ in self._excluded]
+
+        self.shuffle = shuffle
+        self.seed = seed
+        self._mult, self._offset = 1, 0
+        if shuffle and self.count > 1:
+            rng = random.Random(seed)
+            self._mult = rng.randrange(1, self.count)
+            while math.gcd(self._mult, self.count) != 1:
+                self._mult = rng.randrange(1, self.count)
+            self._offset = rng.randrange(self.count)
+
+    def key(self) -> str:
+        """Identity string; descriptors are only meaningful for an equal key."""
+        parts = [str(self.network)]
+        if self.exclude:
+            parts.append("exclude=" + ",".join(self.exclude))
+        if self.shuffle:
+            parts.append(f"shuffle={self.seed}")
+        return " ".join(parts)
+
+    def _excluded_int(self, value: int) -> bool:
+        pos = bisect.bisect_right(self._excluded_starts, value) - 1
+        return pos >= 0 and value <= self._excluded[pos][1]
+
+    def address_int(self, index: int) -> int | None:
+        """Integer address at index, or None if it is excluded."""
+        value = self.first + (self._mult * index + self._offset) % self.count
+        return None if self._excluded_int(value) else value
+
+    def address(self, index: int) -> str | None:
+        value = self.address_int(index)
+        return None if value is None else str(self._addr_cls(value))
+
+    def expand(self, start: int, end: int, stride: int = 1) -> Iterator[str]:
+        """Addresses for the descriptor (start, end, stride), skipping exclusions."""
+        for index in range(start, end, stride):
+            value = self.address_int(index)
+            if value is not None:
+                yield str(self._addr_cls(value))
+
+    def __iter__(self) -> Iterator[str]:
+        return self.expand(0, self.count)
+
+    def split(self, parts: int) -> list[tuple[int, int, int]]:
+        """One interleaved (rank, count, parts) descriptor per part."""
+        return [(part, self.count, parts) for part in range(parts)]
+
+    def batches(self, batch_size: int) -> Iterator[tuple[int, tuple[int, int, int]]]:
+        """Yield (batch_id, (start, end, 1)) descriptors covering the range."""
+        for batch_id, start in enumerate(range(0, self.count, batch_size)):
+            yield batch_id, (start, min(start + batch_size, self.count), 1)
@@ -0,0 +1,147 @@
+# scan_topology.py
+"""Topology-aware sharding of scan targets for security_scanner.py.
+
+Instead of dealing hosts out by list position, targets are grouped
+into subnets (/24 by default, /64 for IPv6) and every subnet is given
+to the rank nearest to it. "Nearest" comes from, in order:
+
+1. the hostfile: a trailing comment on a node's line naming the
+   subnets it sits next to, e.g.
+
+       10.0.1.5 slots=4   # subnets=10.0.1.0/24,10.0.2.0/23
+
+   (a comment, so mpirun ignores it);
+2. measured RTT: with rtt probing on, each rank times one TCP connect
+   to the first host of every subnet, and a subnet goes to the ranks
+   within a small margin of the fastest;
+3. otherwise any rank.
+
+Among the candidates the least-loaded rank wins, so shards stay
+balanced. Subnet spans are index ranges into an unshuffled
+TargetRange, so they travel as ordinary (start, end, stride)
+descriptors.
+"""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import time
+from typing import Iterator
+
+from hostfile import HostEntry
+
+# A subnet's candidates are every rank within this factor (plus slack)
+# of the fastest measured RTT.
+RTT_MARGIN = 1.5
+RTT_SLACK = 0.0005
+
+# Every rank lists all subnet spans and rank 0 sends an owner per span,
+# so topology sharding refuses ranges split into more subnets than this
+# (a /8 at /24); a wide IPv6 range would otherwise never finish listing.
+MAX_SUBNETS = 65536
+
+
+def subnet_bits(version: int, prefix: int) -> int:
+    """Host bits of one subnet: prefix applies to IPv4, IPv6 uses /64."""
+    return (32 - prefix) if version == 4 else 64
+
+
+def subnet_count(targets, prefix: int = 24) -> int:
+    """Number of subnets (see subnet_spans) an unshuffled TargetRange spans."""
+    bits = max(0, min(subnet_bits(targets.version, prefix),
+                      targets.network.max_prefixlen - targets.network.prefixlen))
+    return ((targets.first + targets.count - 1) >> bits) - (targets.first >> bits) + 1
+
+
+def subnet_spans(targets, prefix: int = 24) -> Iterator[tuple[int, str, int, int]]:
+    """(subnet key, subnet CIDR, start, end) index spans covering an unshuffled TargetRange.
+
+    The key is the subnet's network address shifted right by its host
+    bits, which is what subnet_key() returns for any address inside it.
+    """
+    if targets.shuffle:
+        raise ValueError("topology sharding needs an unshuffled target range")
+    bits = max(0, min(subnet_bits(targets.version, prefix),
+                      targets.network.max_prefixlen - targets.network.prefixlen))
+    net_cls = ipaddress.IPv4Network if targets.version == 4 else ipaddress.IPv6Network
+    start = 0
+    while start < targets.count:
+        key = (targets.first + start) >> bits
+        end = min(targets.count, ((key + 1) << bits) - targets.first)
+        cidr = str(net_cls((key << bits, targets.network.max_prefixlen - bits)))
+        yield key, cidr, start, end
+        start = end
+
+
+def subnet_key(targets, index: int, prefix: int = 24) -> int:
+    """Subnet key (see subnet_spans) of the address at an unshuffled index."""
+    bits = max(0, min(subnet_bits(targets.version, prefix),
+                      targets.network.max_prefixlen - targets.network.prefixlen))
+    return (targets.first + index) >> bits
+
+
+def annotated_subnets(entry: HostEntry | None) -> list[str]:
+    """Networks a hostfile entry's `# subnets=...` comment claims."""
+    if entry is None:
+        return []
+    value = entry.annotations.get("subnets", "")
+    return [item for item in value.split(",") if item]
+
+
+def measure_rtt(addresses: list[str], port: int = 80, timeout: float = 0.5,
+                concurrency: int = 256) -> list[float | None]:
+    """Seconds until each address accepted or refused a TCP connect; None if neither."""
+
+    async def probe(ip, limit):
+        async with limit:
+            started = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+            except ConnectionRefusedError:
+                return time.perf_counter() - started  # an RST is a round trip too
+            except (OSError, asyncio.TimeoutError):
+                return None
+            elapsed = time.perf_counter() - started
+            writer.close()
+            return elapsed
+
+    async def run():
+        limit = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(probe(ip, limit) for ip in addresses))
+
+    return asyncio.run(run())
+
+
+def _candidates(cidr: str, ranks: list[int], claims: dict[int, list],
+                rtts: dict[int, dict[int, float | None]], key: int) -> list[int]:
+    net = ipaddress.ip_network(cidr)
+    claimed = [r for r in ranks
+               if any(c.version == net.version and net.overlaps(c) for c in claims.get(r, ()))]
+    if claimed:
+        return claimed
+    measured = {r: rtts[r][key] for r in ranks if rtts.get(r, {}).get(key) is not None}
+    if measured:
+        best = min(measured.values())
+        return [r for r, rtt in measured.items() if rtt <= best * RTT_MARGIN + RTT_SLACK]
+    return ranks
+
+
+def assign_subnets(spans: list[tuple[int, str, int, int]], ranks: list[int],
+                   claims: dict[int, list[str]] | None = None,
+                   rtts: dict[int, dict[int, float | None]] | None = None) -> dict[int, int]:
+    """Map each subnet key to the least-loaded of its nearest ranks.
+
+    claims -- rank -> CIDRs from its hostfile annotation
+    rtts   -- rank -> {subnet key: RTT seconds or None}
+    """
+    claims = {rank: [ipaddress.ip_network(c, strict=False) for c in cidrs]
+              for rank, cidrs in (claims or {}).items()}
+    rtts = rtts or {}
+    load = dict.fromkeys(ranks, 0)
+    owners = {}
+    # Largest spans first, so the greedy balance has small ones to even out with.
+    for key, cidr, start, end in sorted(spans, key=lambda s: s[2] - s[3]):
+        owner = min(_candidates(cidr, ranks, claims, rtts, key), key=lambda r: (load[r], r))
+        owners[key] = owner
+        load[owner] += end - start
+    return owners
@@ -0,0 +1,181 @@
+# scan_wire.py
+"""Packed binary encoding of scan records for MPI buffer transfers.
+
+The scanner's records are small dicts of strings that repeat heavily
+between hosts ('up', 'open', 'syn-ack', 'ssh', one timestamp per
+batch). Pickling writes every one of them out again; this encoding
+stores each distinct string once and the records as uint32 indexes, so
+a batch travels as one flat buffer through the uppercase (buffer) MPI
+calls.
+
+Records are grouped by shape (their key tuple) and stored column by
+column, which lets the receiver build them with dict/zip/map calls
+that run in C instead of a Python loop per field; that is what makes
+decoding cheaper than unpickling the same list.
+
+Layout (native byte order; the cluster is homogeneous):
+
+    b"SRW2"
+    uint32 blob length, blob     distinct strings, UTF-8, NUL-terminated
+    uint32 index count, indexes  uint32 stream:
+        n_shapes,  per shape:  n_keys, (key id << 1 | is_ports)...
+        n_infos,   per info:   n_fields, (key id, value id)...
+        n_records, shape id of every record, in order
+        per shape, per key:    a value id per record of that shape, or
+                               for a ports map the port counts, then
+                               all ports, then all their info ids
+
+An info is one port's detail dict. Only what the scanner produces can
+be packed: string values, plus a ports map of int -> {str: str}.
+pack_records raises ValueError for anything else (cached flags, NUL
+bytes); encode_records then falls back to a pickle, which
+decode_records tells apart by the magic.
+"""
+from __future__ import annotations
+
+import pickle
+import struct
+from array import array
+from itertools import count, islice, repeat
+
+MAGIC = b"SRW2"
+_LEN = struct.Struct("=I")
+
+
+class _Interner(dict):
+    def id(self, value) -> int:
+        found = self.get(value)
+        if found is None:
+            found = self[value] = len(self)
+        return found
+
+    def ids(self, values: list) -> map:
+        """id() of every value, with the new ones interned in bulk (C loops only)."""
+        self.update(zip(dict.fromkeys(values).keys() - self.keys(), count(len(self))))
+        return map(self.__getitem__, values)
+
+
+def pack_records(records: list[dict]) -> bytes:
+    """Encode records (see module docstring); ValueError if one cannot be packed."""
+    strings, shapes, infos = _Interner(), _Interner(), _Interner()
+    order = array("I")
+    groups = []  # per shape: its records
+    for record in records:
+        sid = shapes.id(tuple(record))
+        if sid == len(groups):
+            groups.append([])
+        groups[sid].append(record)
+        order.append(sid)
+
+    head = array("I", [len(shapes)])
+    columns = array("I")
+    for shape, group in zip(shapes, groups):
+        head.append(len(shape))
+        for key in shape:
+            values = [record[key] for record in group]
+            if all(isinstance(v, str) for v in values):
+                head.append(strings.id(key) << 1)
+                columns.extend(strings.ids(values))
+            elif all(isinstance(v, dict) for v in values):
+                head.append(strings.id(key) << 1 | 1)
+                columns.extend(map(len, values))
+                try:
+                    for ports in values:
+                        columns.extend(ports)
+                    # Infos are interned by their items; validated once each below.
+                    for ports in values:
+                        if ports:
+                            columns.extend(map(infos.id, map(tuple, map(dict.items, ports.values()))))
+                except (TypeError, OverflowError) as e:
+                    raise ValueError(f"cannot pack {key!r} values: {e}") from None
+            else:
+                raise ValueError(f"cannot pack {key!r} values")
+    head.append(len(infos))
+    for items in infos:
+        head.append(len(items))
+        for k, v in items:
+            if not isinstance(k, str) or not isinstance(v, str):
+                raise ValueError(f"cannot pack port field {k!r}: {v!r}")
+            head.append(strings.id(k))
+            head.append(strings.id(v))
+    head.append(len(order))
+
+    if any("\0" in s for s in strings):
+        raise ValueError("cannot pack strings containing NUL")
+    blob = "".join(s + "\0" for s in strings).encode("utf-8", "surrogatepass")
+    total = len(head) + len(order) + len(columns)
+    return b"".join((MAGIC, _LEN.pack(len(blob)), blob, _LEN.pack(total),
+                     head.tobytes(), order.tobytes(), columns.tobytes()))
+
+
+def unpack_records(buf) -> list[dict]:
+    """Decode a pack_records buffer (bytes, bytearray or memoryview) back into records."""
+    view = memoryview(buf)
+    if bytes(view[:4]) != MAGIC:
+        raise ValueError("not a packed record buffer")
+    offset = 4
+    (blob_len,) = _LEN.unpack_from(view, offset)
+    offset += _LEN.size
+    strings = str(view[offset:offset + blob_len], "utf-8", "surrogatepass").split("\0")
+    offset += blob_len
+    (n_indexes,) = _LEN.unpack_from(view, offset)
+    offset += _LEN.size
+    indexes = array("I")
+    indexes.frombytes(view[offset:offset + n_indexes * indexes.itemsize])
+    ints = indexes.tolist()
+    string = strings.__getitem__
+
+    shapes = []
+    pos = 1
+    for _ in range(ints[0]):
+        n = ints[pos]
+        shapes.append(ints[pos + 1:pos + 1 + n])
+        pos += 1 + n
+    infos = []
+    pos += 1
+    for _ in range(ints[pos - 1]):
+        n = ints[pos]
+        fields = ints[pos + 1:pos + 1 + 2 * n]
+        infos.append(dict(zip(map(string, fields[::2]), map(string, fields[1::2]))))
+        pos += 1 + 2 * n
+    n_records = ints[pos]
+    order = ints[pos + 1:pos + 1 + n_records]
+    pos += 1 + n_records
+
+    groups = []
+    for sid, shape in enumerate(shapes):
+        m = order.count(sid) if len(shapes) > 1 else n_records
+        columns = []
+        for key in shape:
+            if key & 1:
+                counts = ints[pos:pos + m]
+                total = sum(counts)
+                ports = ints[pos + m:pos + m + total]
+                # dict() copies every info, so records never share a port dict.
+                details = map(dict, map(infos.__getitem__, ints[pos + m + total:pos + m + 2 * total]))
+                pairs = zip(ports, details)
+                columns.append([dict(islice(pairs, c)) if c else {} for c in counts])
+                pos += m + 2 * total
+            else:
+                columns.append(list(map(string, ints[pos:pos + m])))
+                pos += m
+        keys = [strings[key >> 1] for key in shape]
+        groups.append(map(dict, map(zip, repeat(keys), zip(*columns))))
+    if len(groups) == 1:
+        return list(groups[0])
+    return list(map(next, map(groups.__getitem__, order)))
+
+
+def encode_records(records: list[dict]) -> bytes:
+    """pack_records, or a pickle of the list if the records cannot be packed."""
+    try:
+        return pack_records(records)
+    except ValueError:
+        return pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_records(buf) -> list[dict]:
+    """Inverse of encode_records."""
+    if bytes(memoryview(buf)[:4]) == MAGIC:
+        return unpack_records(buf)
+    return pickle.loads(buf)
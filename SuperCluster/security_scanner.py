@@ -2,65 +2,1221 @@
 from mpi4py import MPI
 import nmap
 import requests
+import argparse
+import ipaddress
+import itertools
 import json
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 
+from connect_scan import DEFAULT_PORTS, ConnectScanner, parse_ports
+from hostfile import find_local_entry, parse_hostfile
+from scan_cache import ScanCache
+from scan_columnar import convert_ndjson, write_columnar
+from scan_metrics import RankMetrics, summarize
+from scan_rate import RateController, nmap_probe_stats, subnet_of
+from scan_results import NDJSONResultWriter, ScanCheckpoint
+from scan_store import ScanStore
+from scan_targets import TargetRange
+from scan_topology import (MAX_SUBNETS, annotated_subnets, assign_subnets, measure_rtt,
+                           subnet_count, subnet_key, subnet_spans)
+from scan_wire import decode_records, encode_records
+
+# Point-to-point tags for the dynamic (master/worker) schedule
+TAG_READY = 1   # worker -> master: asking for work, carries (report, probe stats) of the unit just finished
+TAG_WORK = 2    # master -> worker: (kind, unit_id, hosts or (start, end, stride) descriptor[, pps])
+TAG_STOP = 3    # master -> worker: range exhausted, leave the work loop
+TAG_RESULT = 4  # worker -> master: one per-host record, streamed as soon as it is ready (pickle transport)
+TAG_METRICS = 5  # worker -> master: the worker's RankMetrics, once, after TAG_STOP
+TAG_HEARTBEAT = 6  # worker -> master: still alive while units run (fault-tolerant mode)
+TAG_RECORDS = 7  # worker -> master: the records ready so far as one scan_wire buffer (buffer transport)
+
+# Work unit kinds, first field of every TAG_WORK payload
+WORK_SCAN = 'scan'          # full service/OS scan of every host in the unit
+WORK_DISCOVER = 'discover'  # cheap liveness sweep; live hosts are reported back
+WORK_DEEP = 'deep'          # full scan of hosts a discovery sweep found alive
+
+# Ports the connect engine probes for pipeline liveness sweeps
+DISCOVERY_PORTS = (22, 80, 443, 3389)
+
+# Topology sharding times one connect per subnet per rank; beyond this
+# many subnets it relies on hostfile annotations alone.
+RTT_MAX_SUBNETS = 4096
+
+
+class BatchSchedule:
+    """Dynamic schedule: hand out range batches in order, one full scan each"""
+
+    def __init__(self, batches, checkpoint=None):
+        self.batches = batches
+        self.checkpoint = checkpoint
+        self.exhausted = False
+
+    def next_work(self, worker=None):
+        batch = next(self.batches, None)
+        if batch is None:
+            self.exhausted = True
+            return None
+        batch_id, hosts = batch
+        return WORK_SCAN, batch_id, hosts
+
+    def complete(self, report, stats=None):
+        _, batch_id, _ = report
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(batch_id)
+
+    def finished(self):
+        return self.exhausted
+
+
+class TopologySchedule:
+    """Dynamic schedule that hands each worker batches from its own subnets first
+
+    Range batches are routed to the queue of the rank owning the subnet
+    their first host is in (see scan_topology). A worker drains its own
+    queue and, once that is empty, steals from the far end of the
+    longest other queue, so locality never leaves a worker idle while
+    work remains. At most `lookahead` batches are read ahead of dispatch.
+    """
+
+    def __init__(self, batches, owner_of, checkpoint=None, lookahead=4096):
+        self.batches = batches
+        self.owner_of = owner_of
+        self.checkpoint = checkpoint
+        self.lookahead = lookahead
+        self.exhausted = False
+        self.queues = defaultdict(deque)  # owner rank -> (batch_id, descriptor)
+        self.buffered = 0
+
+    def _fill(self, worker):
+        while not self.queues.get(worker) and self.buffered < self.lookahead:
+            batch = next(self.batches, None)
+            if batch is None:
+                self.exhausted = True
+                return
+            self.queues[self.owner_of(batch[1])].append(batch)
+            self.buffered += 1
+            if worker is None:
+                return
+
+    def next_work(self, worker=None):
+        if not self.exhausted:
+            self._fill(worker)
+        own = self.queues.get(worker)
+        if own:
+            batch = own.popleft()
+        else:
+            victim = max(self.queues.values(), key=len, default=None)
+            if not victim:
+                return None
+            batch = victim.pop()
+        self.buffered -= 1
+        batch_id, hosts = batch
+        return WORK_SCAN, batch_id, hosts
+
+    def complete(self, report, stats=None):
+        _, batch_id, _ = report
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(batch_id)
+
+    def finished(self):
+        return self.exhausted and not self.buffered
+
+
+class PipelineSchedule:
+    """Two-stage schedule: liveness sweep, then deep scans of live hosts only
+
+    Discovery batches come straight from the range. Every live host a
+    sweep reports joins the deep queue, and deep work takes priority as
+    soon as a full batch of live hosts is waiting, so service/OS scans
+    overlap with the rest of the sweep instead of waiting for it. A
+    discovery batch only counts as done for the checkpoint once all of
+    its live hosts have been deep-scanned.
+    """
+
+    def __init__(self, batches, batch_size, checkpoint=None):
+        self.batches = batches
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.exhausted = False
+        self.deep_queue = deque()   # (discovery batch id, ip)
+        self.remaining = {}         # discovery batch id -> hosts still owed a result
+        self.deep_units = {}        # deep unit id -> discovery batch ids it covers
+        self.next_deep_id = 0
+
+    def next_work(self, worker=None):
+        if len(self.deep_queue) >= self.batch_size or (self.deep_queue and self.exhausted):
+            return self._deep_work()
+        if not self.exhausted:
+            batch = next(self.batches, None)
+            if batch is not None:
+                batch_id, hosts = batch
+                self.remaining[batch_id] = None  # sweep in flight
+                return WORK_DISCOVER, batch_id, hosts
+            self.exhausted = True
+        if self.deep_queue:
+            return self._deep_work()
+        return None
+
+    def _deep_work(self):
+        count = min(self.batch_size, len(self.deep_queue))
+        entries = [self.deep_queue.popleft() for _ in range(count)]
+        unit_id = self.next_deep_id
+        self.next_deep_id += 1
+        self.deep_units[unit_id] = [batch_id for batch_id, _ in entries]
+        return WORK_DEEP, unit_id, [ip for _, ip in entries]
+
+    def complete(self, report, stats=None):
+        kind, unit_id, live = report
+        if kind == WORK_DISCOVER:
+            self.remaining[unit_id] = len(live)
+            self.deep_queue.extend((unit_id, ip) for ip in live)
+            self._settle(unit_id)
+            return
+        for batch_id in self.deep_units.pop(unit_id):
+            self.remaining[batch_id] -= 1
+            self._settle(batch_id)
+
+    def _settle(self, batch_id):
+        if self.remaining[batch_id] == 0:
+            del self.remaining[batch_id]
+            if self.checkpoint is not None:
+                self.checkpoint.mark_done(batch_id)
+
+    def finished(self):
+        return self.exhausted and not self.deep_queue and not self.remaining
+
+
+class CachedSchedule:
+    """Schedule wrapper that answers fresh hosts from a ScanCache instead of rescanning
+
+    Scan and deep units are expanded on rank 0 and only the hosts without
+    a fresh cache entry are dispatched; cached records go straight to
+    `write`, tagged 'cached': True. Discovery sweeps always run, and a
+    deep unit only reuses entries that were 'up', so a host that was
+    down last time but answers now counts as changed and is rescanned.
+    """
+
+    def __init__(self, schedule, cache, profile, targets, write):
+        self.schedule = schedule
+        self.cache = cache
+        self.profile = profile
+        self.targets = targets
+        self.write = write
+
+    def next_work(self, worker=None):
+        while (work := self.schedule.next_work(worker)) is not None:
+            kind, unit_id, hosts = work
+            if kind == WORK_DISCOVER:
+                return work
+            if isinstance(hosts, tuple):
+                hosts = list(self.targets.expand(*hosts))
+            fresh = self.cache.get_many(hosts, self.profile)
+            if kind == WORK_DEEP:
+                fresh = {ip: r for ip, r in fresh.items() if r['status'] == 'up'}
+            for ip in hosts:
+                if ip in fresh:
+                    self.write(dict(fresh[ip], cached=True))
+            stale = [ip for ip in hosts if ip not in fresh]
+            if stale:
+                return kind, unit_id, stale
+            # Every host answered from cache: the unit is already done.
+            self.schedule.complete((kind, unit_id, None))
+        return None
+
+    def complete(self, report, stats=None):
+        self.schedule.complete(report, stats)
+
+    def finished(self):
+        return self.schedule.finished()
+
+
+class RateLimitedSchedule:
+    """Schedule wrapper that applies a RateController to every unit it hands out
+
+    Each unit is tagged with the subnet of its first host. Units for a
+    subnet already at its concurrency cap are held back (up to
+    `lookahead` of them) while units for other subnets go out; every unit
+    that does go out carries its share of the cluster packet budget as a
+    fourth field. Completions feed the unit's probe stats back into the
+    controller.
+    """
+
+    def __init__(self, schedule, controller, targets, lookahead=64):
+        self.schedule = schedule
+        self.controller = controller
+        self.targets = targets
+        self.lookahead = lookahead
+        self.deferred = deque()  # (subnet, work) waiting for room on subnet
+        self.subnets = {}        # (kind, unit_id) in flight -> subnet
+
+    def _subnet(self, hosts):
+        if isinstance(hosts, tuple):
+            first = next(self.targets.expand(*hosts), None)
+        else:
+            first = hosts[0] if hosts else None
+        return None if first is None else subnet_of(first, self.controller.prefix)
+
+    def _start(self, subnet, work):
+        kind, unit_id, hosts = work
+        if subnet is not None:
+            self.controller.started(subnet)
+            self.subnets[kind, unit_id] = subnet
+        return kind, unit_id, hosts, self.controller.unit_rate()
+
+    def next_work(self, worker=None):
+        for _ in range(len(self.deferred)):
+            subnet, work = self.deferred.popleft()
+            if self.controller.has_room(subnet):
+                return self._start(subnet, work)
+            self.deferred.append((subnet, work))
+        while len(self.deferred) < self.lookahead:
+            work = self.schedule.next_work(worker)
+            if work is None:
+                break
+            subnet = self._subnet(work[2])
+            if subnet is None or self.controller.has_room(subnet):
+                return self._start(subnet, work)
+            self.deferred.append((subnet, work))
+        return None
+
+    def complete(self, report, stats=None):
+        kind, unit_id, _ = report
+        subnet = self.subnets.pop((kind, unit_id), None)
+        if subnet is not None:
+            self.controller.finished(subnet, stats)
+        self.schedule.complete(report, stats)
+
+    def finished(self):
+        return not self.deferred and self.schedule.finished()
+
+
+class LeaseTable:
+    """Fault-tolerant dispatch bookkeeping: which worker holds which unit
+
+    Every unit handed out is leased to its worker until the worker
+    reports it done. Workers holding a lease heartbeat while they scan;
+    one that stays silent for `timeout` seconds is presumed dead and its
+    leases are revoked so the units can be handed to someone else. A
+    late report from a revoked lease is ignored, so no unit completes
+    twice (its records may still be written twice; readers keep the
+    last record per host).
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.held = {}       # (kind, unit_id) -> (worker, work)
+        self.last_seen = {}  # worker -> time.monotonic() of its last message
+        self.dead = set()
+
+    def heard(self, worker):
+        self.last_seen[worker] = time.monotonic()
+
+    def grant(self, worker, work):
+        self.held[work[0], work[1]] = (worker, work)
+        self.heard(worker)
+
+    def release(self, worker, report):
+        """True if `worker` still held the unit `report` completes"""
+        key = report[0], report[1]
+        if self.held.get(key, (None,))[0] != worker:
+            return False
+        del self.held[key]
+        return True
+
+    def silent(self):
+        """Lease holders that have not been heard from within the timeout"""
+        cutoff = time.monotonic() - self.timeout
+        return {worker for worker, _ in self.held.values() if self.last_seen[worker] < cutoff}
+
+    def revoke(self, worker):
+        """Mark worker dead; returns the work it held, for re-issue"""
+        self.dead.add(worker)
+        lost = [key for key, (holder, _) in self.held.items() if holder == worker]
+        return [self.held.pop(key)[1] for key in lost]
+
+
+def _bounded_map(pool, fn, items, limit):
+    """Like pool.map, but with at most `limit` calls in flight; yields in completion order"""
+    running = set()
+    for item in items:
+        running.add(pool.submit(fn, item))
+        if len(running) >= limit:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in as_completed(running):
+        yield future.result()
+
+
+def _nmap_elapsed(scan_data):
+    """Seconds nmap itself reports for a run (its scanstats), 0.0 if absent"""
+    try:
+        return float(scan_data['nmap']['scanstats']['elapsed'])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def default_threads(comm, hostfile='hostfile'):
+    """Per-rank executor size: this node's hostfile slots shared among its ranks
+
+    Scanning is I/O bound, so one rank per node running `slots` scans at
+    once uses the node as fully as `slots` ranks would. Falls back to 1
+    (serial) when the node is not in the hostfile.
+    """
+    # Collective: every rank must call it, whether or not it is listed.
+    local = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    ranks_here = local.Get_size()
+    local.Free()
+    entry = find_local_entry(parse_hostfile(hostfile), (MPI.Get_processor_name(),))
+    if entry is None:
+        return 1
+    return max(1, entry.slots // ranks_here)
+
+
 class DistributedSecurityScanner:
-    def __init__(self):
+    def __init__(self, batch_size=16, nmap_args='-sV -O -T4',
+                 discovery_args='-sn -n -PE -PS22,80,443,3389 -PA80',
+                 discovery_batch_size=256, exclude=(), shuffle=False, seed=None,
+                 engine='nmap', connect_scanner=None, threads=1,
+                 max_rate=None, subnet_cap=4, subnet_prefix=24,
+                 fault_tolerant=False, heartbeat=5.0, heartbeat_timeout=30.0,
+                 topology=None, hostfile='hostfile', rtt_port=80, transport='buffer'):
         self.comm = MPI.COMM_WORLD
         self.rank = self.comm.Get_rank()
         self.size = self.comm.Get_size()
-        self.nm = nmap.PortScanner()
-        
-    def scan_network_range(self, network_range):
-        """Distributed network scanning"""
+        self.nmap_args = nmap_args
+        # Hosts per nmap invocation, and per work unit in dynamic mode.
+        # Larger batches amortise nmap start-up and XML parsing; smaller
+        # ones keep fast ranks busy while a slow host (e.g. OS detection
+        # timing out) only holds up the rank that drew it.
+        self.batch_size = batch_size
+        # Liveness sweeps are cheap, so they run over much larger blocks.
+        self.discovery_args = discovery_args
+        self.discovery_batch_size = discovery_batch_size
+        # Target expansion options; every rank must agree on them.
+        self.exclude = tuple(exclude)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.targets = None
+        # 'nmap' runs nmap per block; 'connect' uses the in-process
+        # asyncio connect scanner (port state only, no -sV/-O).
+        self.engine = engine
+        self.connect_scanner = connect_scanner or ConnectScanner()
+        # The connect engine must work on nodes without an nmap binary.
+        self.nm = nmap.PortScanner() if engine == 'nmap' else None
+        # Work units each rank runs at once on a local thread pool. Scans
+        # mostly wait on the network, so this multiplies throughput well
+        # past one host-block per rank.
+        self.threads = max(1, threads)
+        self._local = threading.local()
+        self._local.nm = self.nm
+        # Adaptive rate control (scan_rate.RateController), off when
+        # max_rate is None: packets/s ceiling for the whole cluster, and
+        # how many units may probe one /subnet_prefix subnet at once.
+        self.max_rate = max_rate
+        self.subnet_cap = subnet_cap
+        self.subnet_prefix = subnet_prefix
+        self.rate_controller = None
+        # Fault-tolerant dynamic mode: rank 0 leases units, workers
+        # heartbeat every `heartbeat` seconds while scanning, and a
+        # worker silent for `heartbeat_timeout` loses its units to the
+        # others. `partial` is set when every worker was lost before the
+        # range was done.
+        self.fault_tolerant = fault_tolerant
+        self.heartbeat = heartbeat
+        self.heartbeat_timeout = heartbeat_timeout
+        self.partial = False
+        self.lost_workers = set()
+        # Topology-aware sharding (scan_topology): None deals hosts out by
+        # position; 'hostfile' gives each /subnet_prefix subnet to a rank
+        # whose hostfile line claims it; 'rtt' also measures connect RTT
+        # (to rtt_port) from every rank for unclaimed subnets.
+        self.topology = topology
+        self.hostfile = hostfile
+        self.rtt_port = rtt_port
+        # How dynamic/pipeline workers stream records to rank 0: 'buffer'
+        # packs everything ready into one scan_wire buffer sent with the
+        # uppercase API, 'pickle' sends each record as its own pickled
+        # message. The static schedule always gathers pickled lists;
+        # benchmark_scan_transport.py shows the C unpickler winning there.
+        self.transport = transport
+        # Where this rank's time went during the last scan_network_range,
+        # and (rank 0 only) the cluster-wide summary built from every rank.
+        self.metrics = RankMetrics(self.rank)
+        self.last_summary = None
+
+    def scan_network_range(self, network_range, schedule='static', sink=None, checkpoint=None,
+                           cache=None, rescan='stale'):
+        """Distributed network scanning
+
+        schedule='static' scatters one fixed chunk per rank.
+        schedule='dynamic' turns rank 0 into a dispatcher that hands out
+        `batch_size` hosts at a time to whichever worker asks next.
+        schedule='pipeline' is dynamic with a liveness sweep in front:
+        only hosts that answer discovery get the `nmap_args` scan.
+
+        In dynamic mode workers stream each host record to rank 0 as soon
+        as it is scanned. Rank 0 passes records to `sink.write` (e.g. an
+        NDJSONResultWriter) and returns the sink; without a sink they are
+        collected into a list. `checkpoint` (a ScanCheckpoint) skips
+        batches finished by an earlier, interrupted run.
+
+        `cache` (a ScanCache, rank 0 only) stores every fresh record under
+        scan_profile(). With rescan='stale' hosts whose cached result is
+        still within the TTL are answered from it instead of rescanned;
+        rescan='all' scans everything and only refreshes the cache.
+
+        Either way each rank fills self.metrics, and rank 0 leaves the
+        reduced cluster summary (scan_metrics.summarize) in last_summary.
+
+        With max_rate set, dynamic and pipeline scans run under a
+        RateController on rank 0 that adapts the packet budget and
+        per-subnet caps to the loss workers report. Static scans have no
+        feedback path and just split max_rate evenly over every slot.
+
+        With fault_tolerant=True (dynamic and pipeline only) a worker
+        that stops heartbeating, or that MPI reports as failed, has its
+        units re-issued to the others, and rank 0 finishes with whatever
+        the surviving workers produced instead of hanging.
+
+        With topology set (static and dynamic only, unshuffled ranges)
+        every subnet is owned by the rank nearest to it: static scans
+        scatter each rank its own subnets, dynamic scans hand workers
+        batches from their subnets first and let them steal once those
+        run out.
+        """
+        if schedule == 'static' and self.fault_tolerant:
+            raise ValueError('fault-tolerant mode needs the dynamic or pipeline schedule')
+        self.metrics = RankMetrics(self.rank)
+        self.last_summary = None
+        self._worker_metrics = []
+        self.partial = False
+        self.lost_workers = set()
+        if schedule in ('dynamic', 'pipeline'):
+            return self._scan_dynamic(network_range, sink, checkpoint,
+                                      pipeline=schedule == 'pipeline',
+                                      cache=cache, rescan=rescan)
+
+        # Every rank builds the same lazy range; only descriptors move.
+        self.targets = self.generate_ip_list(network_range)
+        owners = self._subnet_owners(list(range(self.size))) if self.topology else None
         if self.rank == 0:
             # Master node divides work
-            ip_list = self.generate_ip_list(network_range)
-            chunks = self.divide_chunks(ip_list, self.size)
+            if owners is not None:
+                chunks = self.divide_by_subnet(self.targets, owners, self.size)
+            else:
+                chunks = [[chunk] for chunk in self.divide_chunks(self.targets, self.size)]
         else:
             chunks = None
-            
+
         # Scatter work to workers
         my_chunk = self.comm.scatter(chunks, root=0)
-        
-        results = []
-        for ip in my_chunk:
-            scan_result = self.scan_host(ip)
-            if scan_result:
-                results.append(scan_result)
-        
+        hosts = itertools.chain.from_iterable(self.targets.expand(*d) for d in my_chunk)
+
+        rate = None
+        if self.max_rate:
+            rate = self.max_rate / (self.size * self.threads)
+        results = list(self._scan_hosts(hosts, rate))
+
         # Gather results
         all_results = self.comm.gather(results, root=0)
-        
+        self.metrics.finish()
+        all_metrics = self.comm.gather(self.metrics.to_dict(), root=0)
+
         if self.rank == 0:
+            self.last_summary = summarize(all_metrics, self.metrics.wall_seconds)
             return self.aggregate_results(all_results)
         return None
-    
+
+    def generate_ip_list(self, network_range):
+        """Lazy TargetRange over network_range; nothing is materialised"""
+        return TargetRange(network_range, exclude=self.exclude,
+                           shuffle=self.shuffle, seed=self.seed)
+
+    def divide_chunks(self, targets, n):
+        """One interleaved (start, end, stride) descriptor per rank"""
+        return targets.split(n)
+
+    def divide_by_subnet(self, targets, owners, n):
+        """Per-rank lists of (start, end, 1) descriptors, one per owned subnet"""
+        chunks = [[] for _ in range(n)]
+        for key, _, start, end in subnet_spans(targets, self.subnet_prefix):
+            chunks[owners[key]].append((start, end, 1))
+        return chunks
+
+    def _subnet_owners(self, ranks):
+        """Collective: map subnet key -> owning rank (rank 0 only; None elsewhere)
+
+        Every rank reports the subnets its hostfile line claims and, in
+        'rtt' mode, its connect RTT to the first host of each subnet.
+        """
+        subnets = subnet_count(self.targets, self.subnet_prefix)
+        if subnets > MAX_SUBNETS:
+            raise ValueError(f'{subnets} subnets is too many for topology sharding '
+                             f'(at most {MAX_SUBNETS}); use a shorter --subnet-prefix')
+        spans = list(subnet_spans(self.targets, self.subnet_prefix))
+        entry = find_local_entry(parse_hostfile(self.hostfile), (MPI.Get_processor_name(),))
+        rtts = {}
+        if self.topology == 'rtt' and self.rank in ranks and len(spans) <= RTT_MAX_SUBNETS:
+            probes = [(key, next(self.targets.expand(start, end), None))
+                      for key, _, start, end in spans]
+            probes = [(key, ip) for key, ip in probes if ip is not None]
+            measured = measure_rtt([ip for _, ip in probes], self.rtt_port)
+            rtts = {key: rtt for (key, _), rtt in zip(probes, measured)}
+        info = self.comm.gather((annotated_subnets(entry), rtts), root=0)
+        if self.rank != 0:
+            return None
+        return assign_subnets(spans, ranks, {r: info[r][0] for r in ranks},
+                              {r: info[r][1] for r in ranks})
+
+    def aggregate_results(self, all_results):
+        """Flatten per-rank result lists into one list sorted by address"""
+        merged = [r for rank_results in all_results for r in rank_results if r]
+        merged.sort(key=lambda r: ipaddress.ip_address(r['ip']))
+        return merged
+
+    def _iter_batches(self, batch_size, checkpoint=None):
+        """Yield (batch_id, descriptor) for every batch not already checkpointed"""
+        for batch_id, descriptor in self.targets.batches(batch_size):
+            if checkpoint is None or not checkpoint.is_done(batch_id):
+                yield batch_id, descriptor
+
+    def _nmap_arguments(self, arguments):
+        if self.targets is not None and self.targets.version == 6 and '-6' not in arguments.split():
+            return '-6 ' + arguments
+        return arguments
+
+    def _nmap(self):
+        """Per-thread PortScanner; python-nmap keeps scan state on the instance"""
+        nm = getattr(self._local, 'nm', None)
+        if nm is None:
+            nm = self._local.nm = nmap.PortScanner()
+        return nm
+
+    def _blocks(self, hosts):
+        hosts = iter(hosts)
+        while block := list(itertools.islice(hosts, self.batch_size)):
+            yield block
+
+    def _scan_hosts(self, hosts, rate=None):
+        """Scan hosts in blocks of batch_size, up to `threads` blocks at once"""
+        scan = partial(self.scan_batch, rate=rate)
+        if self.threads == 1:
+            for block in self._blocks(hosts):
+                yield from scan(block)
+            return
+        with ThreadPoolExecutor(self.threads) as pool:
+            for records in _bounded_map(pool, scan, self._blocks(hosts), self.threads):
+                yield from records
+
+    def scan_profile(self):
+        """Cache key for what a scan of one host means under current settings"""
+        if self.engine == 'connect':
+            ports = ','.join(map(str, self.connect_scanner.ports))
+            return f'connect:{ports}'
+        return f'nmap:{self._nmap_arguments(self.nmap_args)}'
+
+    def _scan_dynamic(self, network_range, sink, checkpoint, pipeline=False,
+                      cache=None, rescan='stale'):
+        """Master/worker scan: rank 0 dispatches and collects, ranks 1..N-1 scan"""
+        self.targets = self.generate_ip_list(network_range)
+        slots = self.comm.gather(self.threads, root=0)
+        owners = None
+        if self.topology and self.size > 1:
+            owners = self._subnet_owners(list(range(1, self.size)))
+        if self.rank != 0:
+            self._work_loop()
+            self.metrics.finish()
+            self.comm.send(self.metrics.to_dict(), dest=0, tag=TAG_METRICS)
+            return None
+
+        results = [] if sink is None else sink
+        write = results.append if sink is None else sink.write
+        if pipeline:
+            batches = self._iter_batches(self.discovery_batch_size, checkpoint)
+            schedule = PipelineSchedule(batches, self.batch_size, checkpoint)
+        elif owners is not None:
+            batches = self._iter_batches(self.batch_size, checkpoint)
+            prefix, targets = self.subnet_prefix, self.targets
+            schedule = TopologySchedule(
+                batches, lambda d: owners[subnet_key(targets, d[0], prefix)], checkpoint)
+        else:
+            batches = self._iter_batches(self.batch_size, checkpoint)
+            schedule = BatchSchedule(batches, checkpoint)
+        if cache is not None:
+            write = self._caching_writer(write, cache, pipeline)
+            if rescan == 'stale':
+                schedule = CachedSchedule(schedule, cache, self.scan_profile(),
+                                          self.targets, write)
+        if self.max_rate:
+            workers = self.threads if self.size == 1 else sum(slots[1:])
+            self.rate_controller = RateController(self.max_rate, workers,
+                                                  subnet_cap=self.subnet_cap,
+                                                  prefix=self.subnet_prefix)
+            schedule = RateLimitedSchedule(schedule, self.rate_controller, self.targets)
+
+        leases = None
+        if self.size == 1:
+            # No workers to hand out to; run every work unit locally.
+            self._run_local(schedule, write)
+        else:
+            leases = LeaseTable(self.heartbeat_timeout) if self.fault_tolerant else None
+            self.partial = not self._dispatch(schedule, write, slots, leases)
+            if leases is not None:
+                self.lost_workers = set(leases.dead)
+        self.metrics.finish()
+        live = [w for w in range(1, self.size) if leases is None or w not in leases.dead]
+        self.last_summary = summarize(self._gather_metrics(live), self.metrics.wall_seconds)
+        if self.rate_controller is not None:
+            self.last_summary['rate_control'] = self.rate_controller.snapshot()
+        return results
+
+    def _gather_metrics(self, workers):
+        """Rank 0: metrics of itself and `workers`, including those _dispatch already received
+
+        In fault-tolerant mode a worker that does not report within the
+        heartbeat timeout is left out rather than waited for.
+        """
+        ranks = [self.metrics.to_dict(), *self._worker_metrics]
+        pending = set(workers) - {r['rank'] for r in ranks}
+        deadline = time.monotonic() + self.heartbeat_timeout
+        status = MPI.Status()
+        while pending:
+            if self.fault_tolerant and not self.comm.Iprobe(source=MPI.ANY_SOURCE,
+                                                            tag=TAG_METRICS, status=status):
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.01)
+                continue
+            ranks.append(self.comm.recv(source=MPI.ANY_SOURCE, tag=TAG_METRICS))
+            pending.discard(ranks[-1]['rank'])
+        return sorted(ranks, key=lambda r: r['rank'])
+
+    def _caching_writer(self, write, cache, pipeline=False):
+        """Wrap write so every fresh record is also cached under scan_profile()
+
+        In pipeline mode 'down' records mostly come from the liveness
+        sweep, not from a scan under that profile, so they are not cached:
+        a later non-pipeline run would serve them as full scan results.
+        """
+        profile = self.scan_profile()
+
+        def write_and_cache(record):
+            write(record)
+            if record.get('cached') or record['status'] == 'error':
+                return
+            if pipeline and record['status'] != 'up':
+                return
+            cache.put(record, profile)
+        return write_and_cache
+
+    def _run_local(self, schedule, write):
+        """Single-rank scan: keep `threads` units in flight on the local pool"""
+        records = queue.SimpleQueue()
+        running = set()
+        with ThreadPoolExecutor(self.threads) as pool:
+            while True:
+                while len(running) < self.threads and (work := schedule.next_work()) is not None:
+                    running.add(pool.submit(self._run_work, work, records.put))
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                while not records.empty():
+                    write(records.get())
+                for future in done:
+                    schedule.complete(*future.result())
+
+    def _dispatch(self, schedule, write, slots, leases=None):
+        """Master loop: write streamed records, answer each TAG_READY with work or TAG_STOP
+
+        `slots[w]` is worker w's request slots; each worker keeps one
+        TAG_READY outstanding per slot and leaves once every slot has
+        been answered with TAG_STOP.
+
+        With a LeaseTable the loop polls instead of blocking, so it can
+        notice workers that went silent (or that MPI reports failed),
+        re-issue their units and carry on with the survivors.
+
+        Returns False if the workers ran out before the work did.
+        """
+        status = MPI.Status()
+        idle = []
+        open_slots = {w: n for w, n in enumerate(slots) if w and n}
+        retry = deque()  # revoked units, handed out before new ones
+
+        def lose(workers):
+            nonlocal idle
+            for worker in workers - leases.dead:
+                print(f"[Rank 0] Worker {worker} lost; re-issuing its work")
+                retry.extend(leases.revoke(worker))
+                open_slots.pop(worker, None)
+            idle = [w for w in idle if w not in leases.dead]
+
+        while open_slots:
+            try:
+                if leases is not None and not self.comm.Iprobe(source=MPI.ANY_SOURCE,
+                                                               tag=MPI.ANY_TAG, status=status):
+                    silent = leases.silent()
+                    if not silent:
+                        time.sleep(0.005)
+                        continue
+                    lose(silent)
+                else:
+                    message = self.comm.mprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG,
+                                               status=status)
+                    self.metrics.record_recv(status)
+                    source = status.Get_source()
+                    if leases is not None:
+                        leases.heard(source)
+                    if status.Get_tag() == TAG_RECORDS:
+                        buf = bytearray(status.Get_count(MPI.BYTE))
+                        message.Recv([buf, MPI.BYTE])
+                        for record in decode_records(buf):
+                            write(record)
+                        continue
+                    msg = message.recv()
+                    if status.Get_tag() == TAG_RESULT:
+                        write(msg)
+                        continue
+                    if status.Get_tag() == TAG_METRICS:
+                        # A worker that is already stopped while others still scan.
+                        self._worker_metrics.append(msg)
+                        continue
+                    if status.Get_tag() == TAG_HEARTBEAT:
+                        continue
+                    # TAG_READY. Messages from one worker are matched in send
+                    # order, so every record of the finished unit is already
+                    # written by the time its report shows up here.
+                    if msg is not None and (leases is None or leases.release(source, msg[0])):
+                        schedule.complete(*msg)
+                    if leases is not None and source in leases.dead:
+                        # Given up on, but alive after all: let it go.
+                        self.comm.send(None, dest=source, tag=TAG_STOP)
+                        continue
+                    idle.append(source)
+                # A completion can release new work (live hosts found by a
+                # discovery sweep), so serve every parked worker, not just
+                # the one that asked.
+                while idle:
+                    work = retry.popleft() if retry else schedule.next_work(idle[0])
+                    if work is None:
+                        break
+                    worker = idle.pop(0)
+                    if leases is not None:
+                        leases.grant(worker, work)
+                    self.comm.send(work, dest=worker, tag=TAG_WORK)
+                if idle and schedule.finished() and not retry and not (leases and leases.held):
+                    for worker in idle:
+                        self.comm.send(None, dest=worker, tag=TAG_STOP)
+                        open_slots[worker] -= 1
+                        if not open_slots[worker]:
+                            del open_slots[worker]
+                    idle = []
+            except MPI.Exception:
+                # Only survivable when the MPI library can name the dead
+                # (ULFM); otherwise this is a real error.
+                failed = self._failed_ranks() if leases is not None else set()
+                if not failed:
+                    raise
+                lose(failed)
+        return schedule.finished() and not retry and not (leases and leases.held)
+
+    def _failed_ranks(self):
+        """Ranks the MPI library has seen fail (ULFM), or an empty set if it cannot say"""
+        try:
+            self.comm.Ack_failed()
+            group = self.comm.Get_failed()
+        except (NotImplementedError, MPI.Exception):
+            return set()
+        try:
+            return set(MPI.Group.Translate_ranks(group, list(range(group.Get_size())),
+                                                 self.comm.Get_group()))
+        finally:
+            group.Free()
+
+    def _work_loop(self):
+        """Worker loop: run up to `threads` units at once, streaming records to rank 0
+
+        Units run on a local thread pool; only this (main) thread talks
+        MPI. Records a unit emits are queued and sent before the unit's
+        TAG_READY report, so rank 0 always sees them first.
+        """
+        status = MPI.Status()
+        records = queue.SimpleQueue()
+        running = set()
+        open_slots = self.threads
+        last_beat = time.monotonic()
+        for _ in range(open_slots):
+            self.comm.send(None, dest=0, tag=TAG_READY)
+
+        with ThreadPoolExecutor(self.threads) as pool:
+            while open_slots or running:
+                # Block for the next reply when idle; otherwise only poll.
+                if not running or self.comm.Iprobe(source=0, tag=MPI.ANY_TAG):
+                    waited = time.perf_counter()
+                    work = self.comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+                    if not running:
+                        # Every slot was idle: time spent waiting on rank 0.
+                        self.metrics.record_wait(time.perf_counter() - waited)
+                    self.metrics.record_recv(status)
+                    if status.Get_tag() == TAG_STOP:
+                        open_slots -= 1
+                    else:
+                        running.add(pool.submit(self._run_work, work, records.put))
+                    continue
+                done, running = wait(running, timeout=0.05, return_when=FIRST_COMPLETED)
+                ready = []
+                while not records.empty():
+                    ready.append(records.get())
+                if ready and self.transport == 'buffer':
+                    self.comm.Send([encode_records(ready), MPI.BYTE], dest=0, tag=TAG_RECORDS)
+                elif ready:
+                    MPI.Request.waitall([self.comm.isend(r, dest=0, tag=TAG_RESULT) for r in ready])
+                for future in done:
+                    self.comm.send(future.result(), dest=0, tag=TAG_READY)
+                if self.fault_tolerant and running and time.monotonic() - last_beat >= self.heartbeat:
+                    self.comm.send(None, dest=0, tag=TAG_HEARTBEAT)
+                    last_beat = time.monotonic()
+
+    def _run_work(self, work, emit):
+        """Execute one work unit, emitting host records
+
+        Returns (completion report, probe stats); the stats Counter holds
+        the 'probes' and 'timeouts' rate control feeds on.
+        """
+        kind, batch_id, hosts, *limits = work
+        rate = limits[0] if limits else None
+        stats = Counter()
+        self.metrics.record_unit()
+        if isinstance(hosts, tuple):
+            # Range batches travel as (start, end, stride) descriptors;
+            # deep and cache-filtered units as explicit host lists.
+            hosts = list(self.targets.expand(*hosts))
+        if not hosts:
+            return (kind, batch_id, [] if kind == WORK_DISCOVER else None), stats
+        if kind == WORK_DISCOVER:
+            live = self.discover_batch(hosts, rate, stats)
+            timestamp = datetime.now().isoformat()
+            for ip in hosts:
+                if ip not in live:
+                    emit({'ip': ip, 'status': 'down', 'ports': {}, 'timestamp': timestamp})
+            return (kind, batch_id, [ip for ip in hosts if ip in live]), stats
+        # Units never exceed batch_size hosts: one scan_batch call.
+        for scan_result in self.scan_batch(hosts, rate, stats):
+            emit(scan_result)
+        return (kind, batch_id, None), stats
+
     def scan_host(self, ip):
         """Individual host scan"""
+        return self.scan_batch([ip])[0]
+
+    def discover_batch(self, ips, rate=None, stats=None):
+        """Liveness sweep over a block of hosts; returns the set of live addresses
+
+        If the sweep itself fails every host is treated as live, so the
+        deep scan still runs and records the real error per host. `rate`
+        and `stats` are as for scan_batch; an nmap ping sweep has no
+        port-level loss to report, so only the connect sweep fills stats.
+        """
+        if self.engine == 'connect':
+            sweep = ConnectScanner(DISCOVERY_PORTS, self.connect_scanner.concurrency,
+                                   self.connect_scanner.host_rate, self.connect_scanner.timeout)
+            started = time.perf_counter()
+            try:
+                live = {r['ip'] for r in sweep.scan(ips, rate, stats) if r['status'] == 'up'}
+            except Exception:
+                return set(ips)
+            # Hosts that are down are finished here; live ones count when deep-scanned.
+            wall = time.perf_counter() - started
+            self.metrics.record_scan(len(ips) - len(live), wall, wall)
+            return live
+        started = time.perf_counter()
+        try:
+            print(f"[Rank {self.rank}] Sweeping {len(ips)} hosts {ips[0]}..{ips[-1]}")
+            scan_data = self._nmap().scan(hosts=' '.join(ips),
+                                          arguments=self._rated(self.discovery_args, rate))
+        except Exception:
+            return set(ips)
+        live = {ip for ip, host in scan_data['scan'].items()
+                if host.get('status', {}).get('state') == 'up'}
+        self.metrics.record_scan(len(ips) - len(live), time.perf_counter() - started,
+                                 _nmap_elapsed(scan_data))
+        return live
+
+    def _rated(self, arguments, rate):
+        arguments = self._nmap_arguments(arguments)
+        if rate:
+            arguments += f' --max-rate {rate:g}'
+        return arguments
+
+    def scan_batch(self, ips, rate=None, stats=None):
+        """Scan a block of hosts with a single nmap run (or connect-scan event loop)
+
+        Returns one record per input address, in input order, with the
+        same shape scan_host has always produced. `rate` caps the run at
+        that many packets per second; `stats`, a Counter, gets the
+        run's 'probes' and 'timeouts' added for rate control.
+        """
+        started = time.perf_counter()
+        if self.engine == 'connect':
+            try:
+                records = self.connect_scanner.scan(ips, rate, stats)
+            except Exception as e:
+                self.metrics.record_scan(len(ips), time.perf_counter() - started)
+                return [{'ip': ip, 'error': str(e), 'status': 'error'} for ip in ips]
+            # No subprocess or XML here: the event loop's time is all probing.
+            wall = time.perf_counter() - started
+            self.metrics.record_scan(len(ips), wall, wall)
+            return records
         try:
-            print(f"[Rank {self.rank}] Scanning {ip}")
-            scan_data = self.nm.scan(hosts=ip, arguments='-sV -O -T4')
-            return {
-                'ip': ip,
-                'status': 'up' if ip in scan_data['scan'] else 'down',
-                'ports': scan_data['scan'][ip]['tcp'] if ip in scan_data['scan'] else {},
-                'timestamp': datetime.now().isoformat()
-            }
+            print(f"[Rank {self.rank}] Scanning {len(ips)} hosts {ips[0]}..{ips[-1]}")
+            scan_data = self._nmap().scan(hosts=' '.join(ips),
+                                          arguments=self._rated(self.nmap_args, rate))
         except Exception as e:
-            return {'ip': ip, 'error': str(e), 'status': 'error'}
+            self.metrics.record_scan(len(ips), time.perf_counter() - started)
+            return [{'ip': ip, 'error': str(e), 'status': 'error'} for ip in ips]
+        timestamp = datetime.now().isoformat()
+        scanned = scan_data['scan']
+        if stats is not None:
+            nmap_probe_stats(scanned, stats)
+        records = [{
+            'ip': ip,
+            'status': 'up' if ip in scanned else 'down',
+            'ports': scanned[ip].get('tcp', {}) if ip in scanned else {},
+            'timestamp': timestamp
+        } for ip in ips]
+        # Wall time minus nmap's own elapsed is process spawn plus XML parsing.
+        self.metrics.record_scan(len(ips), time.perf_counter() - started, _nmap_elapsed(scan_data))
+        return records
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Distributed MPI network scanner')
+    parser.add_argument('target', nargs='?', default='192.168.1.0/24',
+                        help='network range to scan (IPv4 or IPv6 CIDR)')
+    parser.add_argument('--exclude', action='append', default=[],
+                        help='address or CIDR to skip; repeatable')
+    parser.add_argument('--shuffle', action='store_true',
+                        help='scan hosts in a seeded pseudo-random order')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='shuffle seed (pass the same one to resume a shuffled scan)')
+    parser.add_argument('--schedule', choices=('static', 'dynamic', 'pipeline'), default='static',
+                        help='static: one scatter chunk per rank; '
+                             'dynamic: rank 0 hands out batches on demand; '
+                             'pipeline: dynamic, deep-scanning only hosts a liveness sweep finds')
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='hosts per nmap run (and per work unit in dynamic mode)')
+    parser.add_argument('--nmap-args', default='-sV -O -T4',
+                        help='arguments passed to every nmap run')
+    parser.add_argument('--engine', choices=('nmap', 'connect'), default='nmap',
+                        help='nmap: one nmap run per block; '
+                             'connect: in-process asyncio TCP connect scan (port state only)')
+    parser.add_argument('--ports', default=','.join(map(str, DEFAULT_PORTS)),
+                        help='connect engine: ports to probe, e.g. 22,80,8000-8100')
+    parser.add_argument('--connect-concurrency', type=int, default=1000,
+                        help='connect engine: connects in flight per rank')
+    parser.add_argument('--host-rate', type=float, default=None,
+                        help='connect engine: max connects per second to any one host')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='connect engine: seconds before a port counts as filtered')
+    parser.add_argument('--max-rate', type=float, default=None,
+                        help='adaptive rate control: packets/s ceiling for the whole cluster; '
+                             'rank 0 backs off when workers report timeouts (dynamic/pipeline)')
+    parser.add_argument('--subnet-cap', type=int, default=4,
+                        help='with --max-rate: work units allowed on one subnet at once')
+    parser.add_argument('--subnet-prefix', type=int, default=24,
+                        help='IPv4 prefix length of a subnet for --max-rate caps and --topology '
+                             '(IPv6 always uses /64)')
+    parser.add_argument('--topology', choices=('hostfile', 'rtt'), default=None,
+                        help='give each subnet to its nearest rank: hostfile uses '
+                             '"# subnets=CIDR,..." comments on hostfile lines, rtt also '
+                             'measures connect RTT from every rank')
+    parser.add_argument('--rtt-port', type=int, default=80,
+                        help='--topology rtt: TCP port timed on the first host of each subnet')
+    parser.add_argument('--fault-tolerant', action='store_true',
+                        help='dynamic/pipeline: re-issue the work of workers that stop '
+                             'heartbeating and finish with partial results instead of hanging')
+    parser.add_argument('--heartbeat', type=float, default=5.0,
+                        help='fault-tolerant mode: seconds between worker heartbeats')
+    parser.add_argument('--heartbeat-timeout', type=float, default=30.0,
+                        help='fault-tolerant mode: silence after which a worker counts as dead')
+    parser.add_argument('--transport', choices=('buffer', 'pickle'), default='buffer',
+                        help='dynamic/pipeline: stream records to rank 0 as packed binary '
+                             'buffers, or as one pickled message per record')
+    parser.add_argument('--hostfile', default='hostfile',
+                        help='MPI hostfile; its slots= values size each rank\'s local pool')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='work units each rank runs at once '
+                             '(default: this node\'s hostfile slots / ranks on the node)')
+    parser.add_argument('--discovery-args', default='-sn -n -PE -PS22,80,443,3389 -PA80',
+                        help='nmap arguments for the pipeline liveness sweep')
+    parser.add_argument('--discovery-batch-size', type=int, default=256,
+                        help='hosts per liveness sweep in pipeline mode')
+    parser.add_argument('--cache', default=None,
+                        help='SQLite result cache on rank 0, keyed by (ip, scan profile)')
+    parser.add_argument('--cache-ttl', type=float, default=24.0,
+                        help='hours a cached result stays fresh')
+    parser.add_argument('--cache-max-entries', type=int, default=1_000_000,
+                        help='cache size cap; least recently used entries are evicted')
+    parser.add_argument('--rescan', choices=('stale', 'all'), default='stale',
+                        help='stale: skip hosts with a fresh cached result; '
+                             'all: rescan everything and refresh the cache')
+    parser.add_argument('--output', default=None,
+                        help='NDJSON file rank 0 writes dynamic-mode results to '
+                             '(default scan_results.ndjson)')
+    parser.add_argument('--columnar', default=None,
+                        help='also write the finished results as a compressed columnar .npz '
+                             '(query it with scan_columnar.py)')
+    parser.add_argument('--store', default=None,
+                        help='scan history directory; the finished --output is added as a new run')
+    parser.add_argument('--checkpoint', default=None,
+                        help='checkpoint file; re-running with the same file resumes the scan')
+    parser.add_argument('--metrics', default=None,
+                        help='write rank 0\'s per-rank timing summary to this JSON file')
+    args = parser.parse_args(argv)
+    if args.fault_tolerant and args.schedule == 'static':
+        parser.error('--fault-tolerant needs --schedule dynamic or pipeline')
+    if args.schedule == 'static':
+        # The static schedule always writes scan_results.json in one go.
+        for flag in ('cache', 'checkpoint', 'store', 'output'):
+            if getattr(args, flag) is not None:
+                parser.error(f'--{flag} needs --schedule dynamic or pipeline')
+    args.output = args.output or 'scan_results.ndjson'
+    if args.topology and (args.shuffle or args.schedule == 'pipeline'):
+        parser.error('--topology needs an unshuffled static or dynamic scan')
+    try:
+        max_prefix = ipaddress.ip_network(args.target, strict=False).max_prefixlen
+    except ValueError as e:
+        parser.error(str(e))
+    if not 0 <= args.subnet_prefix <= max_prefix:
+        parser.error(f'--subnet-prefix must be between 0 and {max_prefix} for {args.target}')
+    if args.topology:
+        try:
+            subnets = subnet_count(TargetRange(args.target), args.subnet_prefix)
+        except ValueError as e:
+            parser.error(str(e))
+        if subnets > MAX_SUBNETS:
+            parser.error(f'--topology: {args.target} spans {subnets} subnets at '
+                         f'--subnet-prefix {args.subnet_prefix} (at most {MAX_SUBNETS})')
+    return args
+
 
 # Run scanner
 if __name__ == "__main__":
-    scanner = DistributedSecurityScanner()
+    args = parse_args()
+    if args.shuffle and args.seed is None:
+        # All ranks must permute identically; rank 0 picks the seed, or
+        # reuses the one a resumed checkpoint was shuffled with.
+        seed = None
+        if MPI.COMM_WORLD.Get_rank() == 0:
+            if args.checkpoint and args.schedule != 'static':
+                seed = ScanCheckpoint.stored_seed(args.checkpoint)
+            if seed is None:
+                seed = random.getrandbits(32)
+                print(f"Shuffle seed {seed} (pass --seed {seed} to repeat this order)")
+            else:
+                print(f"Shuffle seed {seed} (from checkpoint {args.checkpoint})")
+        args.seed = MPI.COMM_WORLD.bcast(seed, root=0)
+    threads = args.threads or default_threads(MPI.COMM_WORLD, args.hostfile)
+    scanner = DistributedSecurityScanner(batch_size=args.batch_size, nmap_args=args.nmap_args,
+                                         discovery_args=args.discovery_args,
+                                         discovery_batch_size=args.discovery_batch_size,
+                                         exclude=args.exclude, shuffle=args.shuffle,
+                                         seed=args.seed, engine=args.engine,
+                                         connect_scanner=ConnectScanner(
+                                             parse_ports(args.ports), args.connect_concurrency,
+                                             args.host_rate, args.timeout),
+                                         threads=threads, max_rate=args.max_rate,
+                                         subnet_cap=args.subnet_cap,
+                                         subnet_prefix=args.subnet_prefix,
+                                         fault_tolerant=args.fault_tolerant,
+                                         heartbeat=args.heartbeat,
+                                         heartbeat_timeout=args.heartbeat_timeout,
+                                         topology=args.topology, hostfile=args.hostfile,
+                                         rtt_port=args.rtt_port, transport=args.transport)
     if MPI.COMM_WORLD.Get_rank() == 0:
         print(f"Starting distributed scan with {MPI.COMM_WORLD.Get_size()} nodes")
-    
-    # Example: Scan local network
-    results = scanner.scan_network_range("192.168.1.0/24")
-    
-    if results and MPI.COMM_WORLD.Get_rank() == 0:
-        with open('scan_results.json', 'w') as f:
-            json.dump(results, f, indent=2)
-        print(f"Scan complete. Found {len(results)} hosts.")
\ No newline at end of file
+
+    if args.schedule != 'static':
+        sink = checkpoint = cache = None
+        error = None
+        if MPI.COMM_WORLD.Get_rank() == 0 and args.checkpoint:
+            # Checkpoint ids count range batches, which are discovery
+            # sweeps in pipeline mode.
+            ckpt_batch = (args.discovery_batch_size if args.schedule == 'pipeline'
+                          else args.batch_size)
+            ckpt_target = scanner.generate_ip_list(args.target).key()
+            try:
+                checkpoint = ScanCheckpoint(args.checkpoint, ckpt_target, ckpt_batch,
+                                            seed=args.seed if args.shuffle else None)
+            except ValueError as e:
+                error = str(e)
+        # A mismatched checkpoint must stop every rank, not just rank 0.
+        error = MPI.COMM_WORLD.bcast(error, root=0)
+        if error:
+            if MPI.COMM_WORLD.Get_rank() == 0:
+                print(f"Error: {error}")
+            sys.exit(2)
+        if MPI.COMM_WORLD.Get_rank() == 0:
+            # Only a resumed scan continues the output; a new one replaces it.
+            sink = NDJSONResultWriter(args.output,
+                                      append=checkpoint is not None and checkpoint.resumed)
+            if args.cache:
+                cache = ScanCache(args.cache, ttl=args.cache_ttl * 3600,
+                                  max_entries=args.cache_max_entries)
+        scanner.scan_network_range(args.target, schedule=args.schedule, sink=sink,
+                                   checkpoint=checkpoint, cache=cache, rescan=args.rescan)
+        if sink is not None:
+            sink.close()
+            print(f"Scan complete. Wrote {sink.count} hosts to {args.output}.")
+            if scanner.partial:
+                print("Partial results: every worker was lost before the scan finished; "
+                      "re-run with the same --checkpoint to scan the rest.")
+            if args.columnar:
+                hosts = convert_ndjson(args.output, args.columnar)
+                print(f"Wrote {hosts} hosts to {args.columnar}.")
+            if args.store:
+                run_id = ScanStore(args.store).add_run(args.output)
+                print(f"Stored as run {run_id} in {args.store}.")
+        if cache is not None:
+            cache.close()
+            print(f"Cache: {cache.hits} hosts reused, {cache.misses} scanned.")
+    else:
+        results = scanner.scan_network_range(args.target, schedule='static')
+
+        if results and MPI.COMM_WORLD.Get_rank() == 0:
+            with open('scan_results.json', 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Scan complete. Found {len(results)} hosts.")
+            if args.columnar:
+                write_columnar(results, args.columnar)
+
+    summary = scanner.last_summary
+    if summary is not None:
+        p95 = summary['latency_seconds']['p95']
+        print(f"Metrics: {summary['hosts_per_second']:.1f} hosts/s, "
+              f"p95 latency {p95 or 0:.2f}s, "
+              f"load imbalance {summary['load_imbalance']['hosts']:.2f}, "
+              f"likely {summary['likely_bound']}-bound.")
+        if args.metrics:
+            with open(args.metrics, 'w') as f:
+                json.dump(summary, f, indent=2)
+        if 'rate_control' in summary:
+            rate = summary['rate_control']
+            print(f"Rate control: ended at {rate['budget_pps']:.0f} pps "
+                  f"after {rate['budget_decreases']} back-offs, "
+                  f"{len(rate['throttled_subnets'])} subnets throttled.")
+
+    if scanner.lost_workers:
+        # A lost rank would hold MPI_Finalize (and mpirun) forever; all
+        # results are already on disk, so end the job here.
+        print(f"Ending job without ranks {sorted(scanner.lost_workers)}.", flush=True)
+        MPI.COMM_WORLD.Abort(1 if scanner.partial else 0)